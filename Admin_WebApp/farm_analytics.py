@@ -1,38 +1,38 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from io import BytesIO
-from scipy.stats import skew, kurtosis
 from google.cloud import firestore
 from google.cloud.firestore import FieldFilter
 from datetime import datetime, timedelta
-import pytz
 import time
 import random
-from google.api_core.exceptions import ResourceExhausted, RetryError
 from collections import defaultdict
-import matplotlib.dates as mdates
-import plotly.express as px
-import plotly.graph_objects as go
-from collection_1 import collection_1_data
-from collection_2 import collection_2_data
-from collection_3 import collection_3_data
-from collection_4 import collection_4_data
-from collection_5 import collection_5_data
-from collection_6 import collection_6_data
-from collection_7 import collection_7_data
-from collection_8 import collection_8_data
-from collection_9 import collection_9_data
-from collection_10 import collection_10_data
-from collection_11 import collection_11_data
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from trebirth.executor import get_executor
+from trebirth.firestore_client import get_client
+from trebirth.instrumentation import start_page_run, show_instrumentation_panel, tracked_cache
+from trebirth.lazy import lazy_import
+from trebirth.timestamps import add_local_dates
+from trebirth.validation import validate_scans
+
+# Loaded on first use; most reruns never plot or convert time zones.
+pytz = lazy_import('pytz')
+px = lazy_import('plotly.express')
+go = lazy_import('plotly.graph_objects')
 
 
 # Set page configuration
 st.set_page_config(layout="wide")
 st.title("Farm Analytics")
 
-db = firestore.Client.from_service_account_json("Admin_WebApp/testdata1-20ec5-firebase-adminsdk-an9r6-a87cacba1d.json")
+db = get_client("Admin_WebApp/testdata1-20ec5-firebase-adminsdk-an9r6-a87cacba1d.json")
+executor = get_executor()
+# Firestore usage of this rerun, shown in the sidebar panel at the end of the page
+page_run = start_page_run('farm_analytics')
 
 
 def convert_to_local_time(timestamp, timezone='Asia/Kolkata'):
@@ -42,12 +42,12 @@ def convert_to_local_time(timestamp, timezone='Asia/Kolkata'):
     
 # Fetch the most recent scan data from the "demo_db" collection
 def get_recent_scans(db, num_scans=3):
-    docs = (
+    query = (
         db.collection('demo_day')
         .order_by('timestamp', direction=firestore.Query.DESCENDING)
         .limit(num_scans)
-        .stream()
     )
+    docs = executor.stream(query, name='recent_scans')
     metadata_list = []
     for doc in docs:
         data_dict = doc.to_dict()
@@ -58,7 +58,8 @@ def get_recent_scans(db, num_scans=3):
             'DeviceName': data_dict.get('Devicename', 'Unknown')
         }
         metadata_list.append(metadata)
-    return metadata_list
+    # RadarRaw as clean float arrays, validated once here
+    return validate_scans(metadata_list, ('RadarRaw',))
 
 # Filter scans by the same device name
 def filter_scans_by_device(scans):
@@ -70,19 +71,23 @@ def filter_scans_by_device(scans):
     return pd.DataFrame()
     
 # Preprocess data for each scan
-def preprocess_multiple_scans(radar_data_list):
+def preprocess_multiple_scans(radar_data_list, validated=False):
     processed_data_list = []
     for radar_raw in radar_data_list:
         df_radar = pd.DataFrame(radar_raw, columns=['Radar'])
+        if validated:
+            processed_data_list.append(df_radar)
+            continue
         df_radar.dropna(inplace=True)
         df_radar.fillna(df_radar.mean(), inplace=True)
         processed_data_list.append(df_radar)
     return processed_data_list
 
 # Function to calculate statistics
-def calculate_statistics(df):
-    df = df.apply(pd.to_numeric, errors='coerce')
-    df.fillna(df.mean(), inplace=True)
+def calculate_statistics(df, validated=False):
+    if not validated:
+        df = df.apply(pd.to_numeric, errors='coerce')
+        df.fillna(df.mean(), inplace=True)
     stats = {
         'Column': df.columns,
         'Mean': df.mean(),
@@ -207,7 +212,7 @@ def main():
             st.markdown(" Data Analysis of 2 Recent Scans with Same Device")
             
             # Preprocess the scan data
-            processed_data_list = preprocess_multiple_scans(filtered_scans['RadarRaw'])
+            processed_data_list = preprocess_multiple_scans(filtered_scans['RadarRaw'], validated=True)
             
             # Extract timestamps and InfStat
             timestamps = filtered_scans['timestamp'].tolist()
@@ -227,7 +232,7 @@ def main():
             
             # Statistics plot in col3
             with col3:
-                stats_dfs = [calculate_statistics(df) for df in processed_data_list]
+                stats_dfs = [calculate_statistics(df, validated=True) for df in processed_data_list]
                 plot_multiple_statistics(stats_dfs, timestamps, infstats, device_names)
         else:
             st.warning("No matching scans found with the same device name.")
@@ -244,17 +249,17 @@ st.write(f"**Plot Size:** Null", color='white')
 
 # Define the collection data mapping
 collection_data = {
-    'Dipak Sangamnere': collection_1_data,
-    'Ramesh Kapre': collection_2_data,
-    'Arvind Khode': collection_3_data,
-    'Ravindra Sambherao': collection_4_data,
-    'Prabhakr Shirsath': collection_5_data,
-    'Arjun Jachak': collection_6_data,
-    'Yash More': collection_7_data,
-    'Anant More': collection_8_data,
-    'Dananjay Yadav': collection_9_data,
-    'Kiran Derle': collection_10_data,
-    'Nitin Gaidhani': collection_11_data
+    'Dipak Sangamnere': lazy_import('collection_1'),
+    'Ramesh Kapre': lazy_import('collection_2'),
+    'Arvind Khode': lazy_import('collection_3'),
+    'Ravindra Sambherao': lazy_import('collection_4'),
+    'Prabhakr Shirsath': lazy_import('collection_5'),
+    'Arjun Jachak': lazy_import('collection_6'),
+    'Yash More': lazy_import('collection_7'),
+    'Anant More': lazy_import('collection_8'),
+    'Dananjay Yadav': lazy_import('collection_9'),
+    'Kiran Derle': lazy_import('collection_10'),
+    'Nitin Gaidhani': lazy_import('collection_11')
 }
 
 # Mapping collections to farmer images
@@ -332,9 +337,14 @@ farm_ages = {
     'Nitin Gaidhani': '12 Years'
 }
 
-# Function to load the data from the imported variables
+# Function to load the data from the collection modules, each imported only when
+# its farm is first selected. 'Date of Scans' is parsed once per collection into
+# a 'Scan Day' date used by all the filters below.
+@tracked_cache('load_collection', st.cache_data)
 def load_collection(collection_name):
-    return collection_data[collection_name]
+    module = collection_data[collection_name]
+    entries = [dict(entry) for entry in getattr(module, f'{module.__name__}_data')]
+    return add_local_dates(entries, field='Date of Scans', out_field='Scan Day', date_format=None, missing=None)
     
 # Multiselect for collections (Dropdown 1)
 collections = st.multiselect(
@@ -355,7 +365,7 @@ if collections:
     df = pd.DataFrame(all_data)
     
     # Convert 'Date of Scans' to datetime
-    df['Date of Scans'] = pd.to_datetime(df['Date of Scans']).dt.date
+    df['Date of Scans'] = df['Scan Day']
     
     # Extract unique dates for the selected collections
     unique_dates = df['Date of Scans'].unique()
@@ -376,7 +386,7 @@ if collections:
         # Process data for each selected collection
         for collection in collections:
             data = load_collection(collection)
-            filtered_data = [entry for entry in data if pd.to_datetime(entry['Date of Scans']).date() in selected_dates]
+            filtered_data = [entry for entry in data if entry['Scan Day'] in selected_dates]
 
             # Calculate total healthy and infected scans for the collection
             total_healthy = sum(entry['Total Healthy Scan'] for entry in filtered_data)
@@ -542,7 +552,7 @@ if collections:
 
                 for collection in collections:
                     data = load_collection(collection)
-                    filtered_data = [entry for entry in data if pd.to_datetime(entry['Date of Scans']).date() in selected_dates]
+                    filtered_data = [entry for entry in data if entry['Scan Day'] in selected_dates]
             
                     # Calculate total healthy and infected scans for the collection
                     total_healthy = sum(entry['Total Healthy Scan'] for entry in filtered_data)
@@ -635,11 +645,11 @@ if collections:
                         # If selected dates are available
                         if selected_dates:  
                                 data = load_collection(collection)  
-                                filtered_data = [entry for entry in data if pd.to_datetime(entry['Date of Scans']).date() in selected_dates]  
+                                filtered_data = [entry for entry in data if entry['Scan Day'] in selected_dates]  
                   
                                 # Extract unique device names and dates  
                                 device_names = list(set(entry['Device Name'] for entry in filtered_data))  
-                                dates = list(set(pd.to_datetime(entry['Date of Scans']).date() for entry in filtered_data))  
+                                dates = list(set(entry['Scan Day'] for entry in filtered_data))  
                   
                                 # Initialize color palettes  
                                 color_palette_healthy = ['#00FF00', '#1E90FF', '#FFA500', '#FFFF00', '#800080', '#FF69B4']  
@@ -652,7 +662,7 @@ if collections:
                                 for i, device_name in enumerate(device_names):  
                                     for date in dates:  
                                         # Filter data for the current device and date  
-                                        device_data = [entry for entry in filtered_data if entry['Device Name'] == device_name and pd.to_datetime(entry['Date of Scans']).date() == date]  
+                                        device_data = [entry for entry in filtered_data if entry['Device Name'] == device_name and entry['Scan Day'] == date]  
                   
                                         # Calculate healthy and infected scans  
                                         healthy_scans = sum(entry['Total Healthy Scan'] for entry in device_data)  
@@ -724,3 +734,5 @@ if collections:
         </div>
     """
     st.markdown(button_html, unsafe_allow_html=True)
+
+show_instrumentation_panel(page_run)
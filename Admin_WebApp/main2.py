@@ -1,28 +1,39 @@
 import streamlit as st
 import numpy as np
-import google.cloud
-from firebase_admin import firestore
-import plotly.graph_objects as go
 import pandas as pd
-import pydeck as pdk
 import calendar
 from PIL import Image
 import base64
 from io import BytesIO
 from google.cloud.firestore import FieldFilter
 import random
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from trebirth.executor import get_executor
+from trebirth.firestore_client import get_client
+from trebirth.instrumentation import start_page_run, show_instrumentation_panel
+from trebirth.lazy import lazy_import
+
+# Only needed by the charts further down the page.
+go = lazy_import('plotly.graph_objects')
+pdk = lazy_import('pydeck')
 
 
 st.set_page_config(layout="wide")
 
-# Authenticate to Firestore with the JSON account key.
-db = firestore.Client.from_service_account_json("Admin_WebApp/testdata1-20ec5-firebase-adminsdk-an9r6-a87cacba1d.json")
+# Authenticate to Firestore with the JSON account key (one shared client per server process).
+db = get_client("Admin_WebApp/testdata1-20ec5-firebase-adminsdk-an9r6-a87cacba1d.json")
+executor = get_executor()
+# Firestore usage of this rerun, shown in the sidebar panel at the end of the page
+page_run = start_page_run('admin_dashboard')
 
 # Define your Firestore query and data extraction logic
 i = 1 
 df = pd.DataFrame()
 TreeNos_list = []
-query = db.collection('Mr.Arjun').where(filter=FieldFilter("RowNo", "==", 1)).get()
+query = executor.stream(db.collection('Mr.Arjun').where(filter=FieldFilter("RowNo", "==", 1)), name='row_trees')
 
 for doc in query: 
     TreeNos_list.append(doc.to_dict()['TreeNo'])
@@ -31,15 +42,12 @@ for doc in query:
 Total_trees = np.max(np.array(TreeNos_list))
 field_filter2 = FieldFilter("InfStat", "==", 'Infected')
 
-count = 1
-no_inf = 0
-while (count <= Total_trees):
-    query = db.collection('Mr.Arjun').where(filter=FieldFilter("RowNo", "==", 1)).where(filter=FieldFilter("TreeNo", "==", count)).where(filter=field_filter2)
-    count_query = query.count().get()
-    nb_docs = count_query[0][0].value
-    count += 1
-    if nb_docs > 0: 
-        no_inf += 1
+# One count query per tree, run in parallel under the executor's concurrency limit
+tree_queries = [
+    db.collection('Mr.Arjun').where(filter=FieldFilter("RowNo", "==", 1)).where(filter=FieldFilter("TreeNo", "==", count)).where(filter=field_filter2)
+    for count in range(1, Total_trees + 1)
+]
+no_inf = sum(nb_docs > 0 for nb_docs in executor.map(executor.count, tree_queries, name='tree_infected_count'))
 
 Inf_per = (no_inf / Total_trees) * 100
 no_healthy = Total_trees - no_inf
@@ -201,3 +209,5 @@ with col2:
             )
         ]
     ))
+
+show_instrumentation_panel(page_run)
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+# Default bands: 1 Hz wide from 0 Hz up to 50 Hz, the range the Filters.py
+# LPF/HPF coefficient sets step through.
+BAND_WIDTH = 1.0
+BAND_TOP = 50.0
+
+
+def band_edges(width=BAND_WIDTH, top=BAND_TOP, bottom=0.0):
+    # Edges bottom, bottom + width, ... up to top; the last band is cut at top.
+    edges = np.arange(bottom, top, width)
+    return np.append(edges, top)
+
+
+def band_labels(edges):
+    return [f'{low:g}-{high:g} Hz' for low, high in zip(edges[:-1], edges[1:])]
+
+
+def band_power(df, fs, edges=None):
+    """Mean power of every column of df in each frequency band.
+
+    All columns are transformed together with one rFFT (shorter scans'
+    NaN padding is treated as zeros, which adds no energy). The one-sided
+    power spectrum is scaled so it sums to the mean square of the scan
+    (Parseval), and each band sums the bins with low <= f < high, the last
+    band including its top edge. Bands therefore add up to the scan's
+    mean square over the frequencies they cover, and the value is the
+    same as the mean square of the scan band-pass filtered to that band
+    by an ideal filter. Returns a scans x bands DataFrame.
+    """
+    edges = band_edges() if edges is None else np.asarray(edges, dtype=float)
+    values = df.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    n = len(values)
+    if n == 0:
+        return pd.DataFrame(np.zeros((len(df.columns), len(edges) - 1)), index=df.columns, columns=band_labels(edges))
+
+    spectra = np.fft.rfft(np.where(valid, values, 0.0), axis=0)
+    power = np.abs(spectra) ** 2
+    # Every bin except DC (and Nyquist for even n) stands for a +/- frequency pair.
+    power[1:(n + 1) // 2] *= 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        power /= n * valid.sum(axis=0)
+
+    freqs = np.fft.rfftfreq(n, 1 / fs)
+    cumulative = np.vstack([np.zeros((1, power.shape[1])), np.cumsum(power, axis=0)])
+    index = np.searchsorted(freqs, edges, side='left')
+    index[-1] = np.searchsorted(freqs, edges[-1], side='right')
+    bands = cumulative[index[1:]] - cumulative[index[:-1]]
+    return pd.DataFrame(bands.T, index=df.columns, columns=band_labels(edges))
+
+
+def band_energy_features(df, fs, edges=None):
+    # band_power as an export sheet: one row per scan, Column first.
+    bands = band_power(df, fs, edges)
+    bands.insert(0, 'Column', [str(column) for column in bands.index])
+    return bands.reset_index(drop=True)
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+# Defaults for the page: 0.2 s windows, bursts above median + 4 MADs of the scan's RMS.
+BURST_WINDOW_SECONDS = 0.2
+BURST_THRESHOLD = 4.0
+
+# MAD scaled to a standard deviation for Gaussian noise.
+MAD_SCALE = 1.4826
+
+
+def _cumulative_energy(x):
+    # (samples + 1, scans) running sum of squares, starting from a row of zeros.
+    squares = np.cumsum(x * x, axis=0)
+    return np.vstack([np.zeros((1, x.shape[1])), squares])
+
+
+def running_rms(values, window):
+    """RMS and energy of every window of samples, for all columns at once.
+
+    values is (samples, scans), NaN-padded at the end for shorter scans. Row
+    i of the result covers samples i .. i + window - 1; windows that run into
+    the padding are NaN. Each window costs one subtraction of cumulative
+    sums, so the whole pass is O(samples) whatever the window length.
+    """
+    values = np.asarray(values, dtype=float)
+    window = max(1, min(int(window), len(values)))
+    lengths = (~np.isnan(values)).sum(axis=0)
+    cumulative = _cumulative_energy(np.nan_to_num(values))
+    energy = cumulative[window:] - cumulative[:-window]
+    # Rounding in the running sum can leave tiny negatives in quiet stretches.
+    energy = np.maximum(energy, 0.0)
+    energy[np.arange(len(energy))[:, None] > lengths - window] = np.nan
+    return np.sqrt(energy / window), energy
+
+
+def adaptive_threshold(rms, k=BURST_THRESHOLD):
+    # Per scan: the median window RMS plus k robust standard deviations (MAD),
+    # so a few loud bursts barely move the threshold they are measured against.
+    with np.errstate(all='ignore'):
+        baseline = np.nanmedian(rms, axis=0)
+        spread = MAD_SCALE * np.nanmedian(np.abs(rms - baseline), axis=0)
+    return baseline, baseline + k * spread
+
+
+def _bursts(df, fs, window_seconds, k, min_duration):
+    values = df.to_numpy(dtype=float)
+    window = max(1, int(round(window_seconds * fs)))
+    rms, _ = running_rms(values, window)
+    baseline, threshold = adaptive_threshold(rms, k)
+    above = rms > threshold
+    # +1 where a run starts, -1 one past where it ends, scan by scan.
+    edges = np.diff(np.pad(above.T.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+    scans, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    # The run's windows cover samples starts .. ends + window - 2, including
+    # the quiet edges of windows that only partly overlap the burst. Trim
+    # window - 1 samples off each side, keeping at least the middle sample.
+    durations = np.maximum(ends - starts - window + 1, 1)
+    first_sample = starts + (ends - starts + window - 1 - durations) // 2
+    keep = durations >= min_duration * fs
+    scans, starts, ends, durations, first_sample = scans[keep], starts[keep], ends[keep], durations[keep], first_sample[keep]
+
+    cumulative = _cumulative_energy(np.nan_to_num(values))
+    peak_rms = [np.nanmax(rms[s:e, scan]) for scan, s, e in zip(scans, starts, ends)]
+    bursts = pd.DataFrame({
+        'Column': df.columns[scans],
+        'Start (s)': first_sample / fs,
+        'Duration (s)': durations / fs,
+        'Peak RMS': np.asarray(peak_rms, dtype=float),
+        'Energy': cumulative[first_sample + durations, scans] - cumulative[first_sample, scans],
+    })
+    return bursts, baseline, threshold, cumulative[-1], (~np.isnan(values)).sum(axis=0) / fs
+
+
+def detect_bursts(df, fs, window_seconds=BURST_WINDOW_SECONDS, k=BURST_THRESHOLD, min_duration=0.0):
+    """Bursts of activity in every column of df.
+
+    A burst is a run of windows whose RMS is above the scan's adaptive
+    threshold; it spans from the first window's last sample to the last
+    window's first sample (at least one sample), so its start and duration
+    do not grow with the window length. Runs are found for all scans in one
+    pass over the (windows, scans) mask. Returns one row per burst: Column,
+    Start (s), Duration (s), Peak RMS, Energy.
+    """
+    return _bursts(df, fs, window_seconds, k, min_duration)[0]
+
+
+def burst_features(df, fs, window_seconds=BURST_WINDOW_SECONDS, k=BURST_THRESHOLD, min_duration=0.0):
+    # One row per column of df, with its bursts summarized as feature columns
+    # for the Time Domain Features sheet (merged on Column).
+    bursts, baseline, threshold, total_energy, seconds = _bursts(df, fs, window_seconds, k, min_duration)
+    grouped = bursts.groupby('Column', sort=False)
+    count = grouped.size().reindex(df.columns, fill_value=0).to_numpy()
+    durations = grouped['Duration (s)']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        features = pd.DataFrame({
+            'Column': [str(column) for column in df.columns],
+            'Burst Count': count,
+            'Bursts per Minute': count / seconds * 60,
+            'Burst Duration (s)': durations.sum().reindex(df.columns, fill_value=0.0).to_numpy(),
+            'Mean Burst Duration (s)': durations.mean().reindex(df.columns).to_numpy(),
+            'Longest Burst (s)': durations.max().reindex(df.columns).to_numpy(),
+            'First Burst (s)': grouped['Start (s)'].min().reindex(df.columns).to_numpy(),
+            'Burst Energy Fraction': grouped['Energy'].sum().reindex(df.columns, fill_value=0.0).to_numpy() / total_energy,
+            'Background RMS': baseline,
+            'Burst Threshold RMS': threshold,
+        })
+    positions = grouped['Start (s)'].agg(lambda starts: ', '.join(f'{start:.2f}' for start in starts))
+    features['Burst Positions (s)'] = positions.reindex(df.columns, fill_value='').to_numpy()
+    return features
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# Complex products held in memory at once when correlating pairs.
+PAIR_BLOCK_VALUES = 1 << 22
+
+
+def _centered(df):
+    # (samples, scans) float array with each column's mean removed and NaN
+    # (padding of shorter scans) set to zero, so it adds nothing to the sums.
+    values = df.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    means = np.where(valid, values, 0.0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+    return np.where(valid, values - means, 0.0)
+
+
+def cross_correlation(df, max_lag=None, fs=None):
+    """Peak normalized cross-correlation and its lag for every pair of columns.
+
+    Each column gets one rFFT, reused for all the pairs it is in; a pair's
+    full cross-correlation is the inverse transform of X1 * conj(X2). Values
+    are normalized by the two scans' energies, so for scans of equal length
+    the value at lag 0 is their Pearson correlation. Best Lag is the k in
+    [-max_lag, max_lag] that maximizes sum(x1[n + k] * x2[n]): Column 1 runs
+    k samples behind Column 2; pairs with a constant or empty scan get a NaN
+    peak and lag 0. Pairs come in the same order as columns_reports_unique.
+    """
+    columns = list(df.columns)
+    n_columns = len(columns)
+    first, second = np.triu_indices(n_columns, k=1)
+    result = pd.DataFrame({'Column 1': [columns[i] for i in first], 'Column 2': [columns[j] for j in second]})
+    if len(first) == 0 or len(df) == 0:
+        result['Peak Correlation'] = np.nan
+        result['Best Lag'] = 0
+        if fs:
+            result['Best Lag (s)'] = 0.0
+        return result
+
+    x = _centered(df)
+    samples = len(x)
+    max_lag = samples - 1 if max_lag is None else int(min(max_lag, samples - 1))
+    # Long enough that lags up to max_lag do not wrap around.
+    nfft = 1 << (samples + max_lag - 1).bit_length()
+    spectra = np.fft.rfft(x, nfft, axis=0).T
+    energy = np.sum(x * x, axis=0)
+    # Constant scans keep only rounding noise after centering; count them as empty.
+    raw_energy = np.nansum(df.to_numpy(dtype=float) ** 2, axis=0)
+    energy[energy <= raw_energy * (samples * np.finfo(float).eps) ** 2] = 0.0
+    lags = np.arange(-max_lag, max_lag + 1)
+
+    peaks = np.empty(len(first))
+    best = np.empty(len(first), dtype=int)
+    block = max(1, PAIR_BLOCK_VALUES // spectra.shape[1])
+    for start in range(0, len(first), block):
+        i, j = first[start:start + block], second[start:start + block]
+        full = np.fft.irfft(spectra[i] * np.conj(spectra[j]), nfft, axis=1)
+        # Negative lags sit at the end of the circular result.
+        window = full[:, lags % nfft]
+        k = np.argmax(window, axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            peaks[start:start + block] = window[np.arange(len(i)), k] / np.sqrt(energy[i] * energy[j])
+        best[start:start + block] = lags[k]
+    # A scan with no energy left has no peak; its argmax over zeros would be -max_lag.
+    no_peak = ~np.isfinite(peaks)
+    peaks[no_peak] = np.nan
+    best[no_peak] = 0
+
+    result['Peak Correlation'] = peaks
+    result['Best Lag'] = best
+    if fs:
+        result['Best Lag (s)'] = best / fs
+    return result
+
+
+def pair_lags(correlation):
+    # {(column 1, column 2): best lag} from cross_correlation(), for columns_reports_unique(lags=...).
+    return dict(zip(zip(correlation['Column 1'], correlation['Column 2']), correlation['Best Lag']))
@@ -1,33 +1,30 @@
 import streamlit as st
-from google.cloud import firestore
 import pandas as pd
-from io import BytesIO
-import matplotlib.pyplot as plt
 from datetime import datetime
 import numpy as np
 import time
 import zipfile
 import os
+import sys
 import random
-from scipy import signal
 from google.cloud.firestore_v1.base_query import FieldFilter
-from scipy.stats import skew, kurtosis
-from preprocess import detrend, fq, stats_radar, columns_reports_unique
-from google.api_core.exceptions import ResourceExhausted, RetryError
-from Filters import (coefLPF1Hz, coefLPF2Hz, coefLPF3Hz, coefLPF4Hz, coefLPF5Hz, coefLPF6Hz, coefLPF7Hz, coefLPF8Hz, 
-                     coefLPF9Hz, coefLPF10Hz, coefLPF11Hz, coefLPF12Hz, coefLPF13Hz, coefLPF14Hz, coefLPF15Hz, 
-                     coefLPF16Hz, coefLPF17Hz, coefLPF18Hz, coefLPF19Hz, coefLPF20Hz, coefLPF21Hz, coefLPF22Hz, 
-                     coefLPF23Hz, coefLPF24Hz, coefLPF25Hz, coefLPF26Hz, coefLPF27Hz, coefLPF28Hz, coefLPF29Hz, 
-                     coefLPF30Hz, coefLPF31Hz, coefLPF32Hz, coefLPF33Hz, coefLPF34Hz, coefLPF35Hz, coefLPF36Hz, 
-                     coefLPF37Hz, coefLPF38Hz, coefLPF39Hz, coefLPF40Hz, coefLPF41Hz, coefLPF42Hz, coefLPF43Hz, 
-                     coefLPF44Hz, coefLPF45Hz, coefLPF46Hz, coefLPF47Hz, coefLPF48Hz, coefLPF49Hz, coefLPF50Hz,
-                     coefHPF1Hz, coefHPF2Hz, coefHPF3Hz, coefHPF4Hz, coefHPF5Hz, coefHPF6Hz, coefHPF7Hz, coefHPF8Hz, 
-                     coefHPF9Hz, coefHPF10Hz, coefHPF11Hz, coefHPF12Hz, coefHPF13Hz, coefHPF14Hz, coefHPF15Hz, 
-                     coefHPF16Hz, coefHPF17Hz, coefHPF18Hz, coefHPF19Hz, coefHPF20Hz, coefHPF21Hz, coefHPF22Hz, 
-                     coefHPF23Hz, coefHPF24Hz, coefHPF25Hz, coefHPF26Hz, coefHPF27Hz, coefHPF28Hz, coefHPF29Hz, 
-                     coefHPF30Hz, coefHPF31Hz, coefHPF32Hz, coefHPF33Hz, coefHPF34Hz, coefHPF35Hz, coefHPF36Hz, 
-                     coefHPF37Hz, coefHPF38Hz, coefHPF39Hz, coefHPF40Hz, coefHPF41Hz, coefHPF42Hz, coefHPF43Hz, 
-                     coefHPF44Hz, coefHPF45Hz, coefHPF46Hz, coefHPF47Hz, coefHPF48Hz, coefHPF49Hz, coefHPF50Hz)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from trebirth.executor import get_executor
+from trebirth.firestore_client import get_client
+from trebirth.instrumentation import start_page_run, show_instrumentation_panel
+from trebirth.lazy import lazy_import
+from trebirth.validation import validate_scans
+from preprocess import SAMPLING_RATE, detrend_columns, fq, stats_radar, columns_reports_unique, resample_scans, scan_rate
+from profiling import StageProfiler
+from correlation import cross_correlation, pair_lags
+from bursts import BURST_THRESHOLD, BURST_WINDOW_SECONDS, burst_features
+from bands import BAND_TOP, BAND_WIDTH, band_edges, band_energy_features
+from export import COLUMNAR_FORMATS, EXCEL_MIME, ZIP_MIME, columnar_formats, columnar_zip, excel_bytes
+
+# The 100 FIR coefficient lists are only needed once scans are being filtered.
+Filters = lazy_import('Filters')
+scipy_stats = lazy_import('scipy.stats')
 
 def stats_filtereddata(df, band):
     stats = {
@@ -46,8 +43,8 @@ def stats_filtereddata(df, band):
         stats["PTP"].append(np.ptp(df[column]))
         stats["Mean"].append(np.mean(df[column]))
         stats["RMS"].append(np.sqrt(np.mean(df[column]**2)))
-        stats["Skew"].append(skew(df[column]))
-        stats["Kurtosis"].append(kurtosis(df[column]))
+        stats["Skew"].append(scipy_stats.skew(df[column]))
+        stats["Kurtosis"].append(scipy_stats.kurtosis(df[column]))
 
     return pd.DataFrame(stats)
 
@@ -64,6 +61,24 @@ def process(coef, in_signal):
         out_signal.append(out)
         k = (k + 1) % FILTERTAPS
     return out_signal
+
+def compare_columns(df, max_lag, align=False):
+    # Difference statistics plus the peak of the lagged cross-correlation for every pair;
+    # with align, each pair is shifted by its best lag before the statistics.
+    with profiler.stage('cross_correlation'):
+        correlation = cross_correlation(df, max_lag, SAMPLING_RATE)
+    report = columns_reports_unique(df, pair_lags(correlation) if align else None)
+    if report.empty:
+        return correlation
+    return report.merge(correlation, on=['Column 1', 'Column 2'], how='left')
+
+def time_domain_features(df, window_seconds, threshold):
+    # stats_radar per column, with that column's activity bursts alongside
+    with profiler.stage('stats_radar'):
+        features = stats_radar(df, validated=True)
+    with profiler.stage('bursts'):
+        bursts = burst_features(df, SAMPLING_RATE, window_seconds, threshold)
+    return features.merge(bursts, on='Column', how='left')
   
 # Set page configuration
 st.set_page_config(layout="wide")
@@ -79,37 +94,20 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-def exponential_backoff(retries):
-    base_delay = 1
-    max_delay = 60
-    delay = base_delay * (2 ** retries) + random.uniform(0, 1)
-    return min(delay, max_delay)
-
-def get_firestore_data(query):
-    retries = 0
-    max_retries = 10
-    while retries < max_retries:
-        try:
-            results = query.stream()
-            return list(results)
-        except ResourceExhausted as e:
-            st.warning(f"Quota exceeded, retrying... (attempt {retries + 1})")
-            time.sleep(exponential_backoff(retries))
-            retries += 1
-        except RetryError as e:
-            st.warning(f"Retry error: {e}, retrying... (attempt {retries + 1})")
-            time.sleep(exponential_backoff(retries))
-            retries += 1
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
-            break
-    raise Exception("Max retries exceeded")
-
-# Authenticate to Firestore with the JSON account key.
-db = firestore.Client.from_service_account_json("Data_Analytics/testdata1-20ec5-firebase-adminsdk-an9r6-3deba9e5fd.json")
+# Authenticate to Firestore with the JSON account key (one shared client per server process).
+db = get_client("Data_Analytics/testdata1-20ec5-firebase-adminsdk-an9r6-3deba9e5fd.json")
+# All reads go through the executor: read budget, retries on quota errors, metrics
+executor = get_executor()
+# Firestore usage of this rerun, shown in the sidebar panel at the end of the page
+page_run = start_page_run('data_analytics')
+
+# Wall/CPU time and peak memory per pipeline stage. Opt-in, since tracemalloc
+# slows down every allocation while it is on.
+profile_stages = st.sidebar.checkbox('Profile pipeline stages', value=False)
+profiler = StageProfiler(enabled=profile_stages)
 
 # User input for Row No., Tree No., Scan No., and Label
-st.write(db.collection('BT_Classic').document('T10R120S2').get())
+st.write(executor.get(db.collection('BT_Classic').document('T10R120S2'), name='bt_classic_sample'))
 row_number = st.text_input('Enter Row number')
 tree_number = st.text_input('Enter Tree number')
 scan_number = st.text_input('Enter Scan number', 'All')
@@ -118,8 +116,25 @@ bucket_number = st.text_input('Enter Bucket number', 'All')
 # Dropdown for InfStat label selection
 label_infstat = st.selectbox('Select Label', ['All', 'Infected', 'Healthy'], index=0)
 
+# Polynomial removed from each scan before features and filtering (0 = mean only)
+detrend_order = st.selectbox('Detrend Order', [0, 1, 2, 3], index=1, help='0 subtracts the mean, 1 removes a linear drift, 2-3 slower curvature.')
+
+# Burst detection for the Time Domain Features: running RMS over short windows
+# against a threshold set from each scan's own background level
+burst_window = st.number_input('Burst Window (s)', min_value=0.05, max_value=5.0, value=BURST_WINDOW_SECONDS, step=0.05)
+burst_threshold = st.number_input('Burst Threshold (MADs above median RMS)', min_value=1.0, max_value=20.0, value=BURST_THRESHOLD, step=0.5)
+
+# Frequency bands for the Band Energy sheet, all taken from one FFT per scan
+band_width = st.number_input('Band Width (Hz)', min_value=0.1, max_value=25.0, value=BAND_WIDTH, step=0.5)
+band_top = st.number_input('Top Band Edge (Hz)', min_value=1.0, max_value=SAMPLING_RATE / 2, value=BAND_TOP, step=1.0)
+
 # Dropdown for selecting sheets in Excel
-selected_sheets = st.multiselect('Select Sheets', ['Raw Data', 'Detrended Data', 'Normalized Data', 'Detrended & Normalized Data', 'Metadata', 'Time Domain Features', 'Frequency Domain Features', 'Columns Comparison'], default=['Raw Data', 'Metadata'])
+selected_sheets = st.multiselect('Select Sheets', ['Raw Data', 'Detrended Data', 'Normalized Data', 'Detrended & Normalized Data', 'Metadata', 'Time Domain Features', 'Frequency Domain Features', 'Band Energy', 'Columns Comparison'], default=['Raw Data', 'Metadata'])
+
+# Lag search for Columns Comparison: scans of a tree rarely start on the same sample
+max_lag_seconds = st.number_input('Max Lag (s)', min_value=0.0, max_value=30.0, value=5.0, step=0.5, help='Largest shift between two scans searched for the peak cross-correlation.')
+align_pairs = st.checkbox('Align scans before comparing', value=False, help='Shift each pair by its best lag before the difference statistics in Columns Comparison.')
+max_lag = int(max_lag_seconds * SAMPLING_RATE)
 
 # Create a reference to the Firestore collection
 query = db.collection('BT_Classic') 
@@ -138,11 +153,16 @@ if label_infstat != 'All':
 
 # Get documents based on the query
 try:
-    query_results = [doc.to_dict() for doc in query.stream()]
+    with profiler.stage('fetch'):
+        query_results = [doc.to_dict() for doc in executor.stream(query, name='bt_classic')]
 except Exception as e:
     st.error(f"Failed to retrieve data: {e}")
     st.stop()
 
+# RadarRaw/Ax/Ay/Az become clean float arrays here, once; the stages below skip their own checks
+with profiler.stage('validate'):
+    query_results = validate_scans(query_results)
+
 if not query_results:
     st.write("No data found matching the specified criteria.")
 else:
@@ -160,13 +180,24 @@ else:
             return data[100:-100]
         return data
 
-    for doc in query_results:
-        radar_data.append(slice_data(doc.get('RadarRaw', [])))
-        #adxl_data.append(slice_data(doc.get('ADXLRaw', [])))
-        ax_data.append(slice_data(doc.get('Ax', [])))
-        ay_data.append(slice_data(doc.get('Ay', [])))
-        az_data.append(slice_data(doc.get('Az', [])))
+    # Scans from devices with other sampling rates are resampled to the rate
+    # the filters assume, before the 1 s trim at each end.
+    scan_rates = [scan_rate(doc) for doc in query_results]
+    with profiler.stage('resample'):
+        for field, channel_data in (('RadarRaw', radar_data), ('Ax', ax_data), ('Ay', ay_data), ('Az', az_data)):
+            scans = resample_scans([doc.get(field, []) for doc in query_results], scan_rates, SAMPLING_RATE, validated=True)
+            channel_data.extend(slice_data(scan) for scan in scans)
+        #adxl_data = [slice_data(scan) for scan in resample_scans([doc.get('ADXLRaw', []) for doc in query_results], scan_rates, SAMPLING_RATE)]
+    resampled_count = sum(rate != SAMPLING_RATE for rate in scan_rates)
+    if resampled_count:
+        st.info(f"Resampled {resampled_count} of {len(scan_rates)} scans to {SAMPLING_RATE} Hz.")
+    dropped_count = sum(doc['NaNCount'] + doc['InvalidCount'] for doc in query_results)
+    if dropped_count:
+        st.info(f"Dropped {dropped_count} missing or non-numeric samples; see NaNCount/InvalidCount in the metadata.")
+
+    for doc, rate in zip(query_results, scan_rates):
         metadata = doc
+        metadata['SamplingRate'] = rate
         # Convert datetime values to timezone-unaware
         for key, value in metadata.items():
             if isinstance(value, datetime):
@@ -184,10 +215,17 @@ else:
             #processed_list.append(df)
         #return pd.concat(processed_list, axis=1)
 
-    def process_data(data_list, prefix):
+    def process_data(data_list, prefix, validated=False):
+        if validated:
+            # Clean float arrays already: one column per non-empty scan, NaN-padded to the longest
+            columns = {f'{prefix}{i+1}': pd.Series(data) for i, data in enumerate(data_list) if len(data)}
+            if not columns:
+                st.warning("No data processed. Returning empty DataFrame.")
+            return pd.DataFrame(columns)
+
         processed_list = []
         for i, data in enumerate(data_list):
-            if not data:  # Skip empty data
+            if len(data) == 0:  # Skip empty data
                 continue
         
             df = pd.DataFrame(data).dropna()
@@ -211,30 +249,34 @@ else:
             st.warning("No data processed. Returning empty DataFrame.")
             return pd.DataFrame()  # Return an empty DataFrame if no data was processed
 
-    df_radar = process_data(radar_data, 'Radar ')
-    #df_adxl = process_data(adxl_data, 'ADXL ')
-    df_ax = process_data(ax_data, 'Ax ')
-    df_ay = process_data(ay_data, 'Ay ')
-    df_az = process_data(az_data, 'Az ')
+    with profiler.stage('process_data'):
+        df_radar = process_data(radar_data, 'Radar ', validated=True)
+        #df_adxl = process_data(adxl_data, 'ADXL ')
+        df_ax = process_data(ax_data, 'Ax ', validated=True)
+        df_ay = process_data(ay_data, 'Ay ', validated=True)
+        df_az = process_data(az_data, 'Az ', validated=True)
 
-    # Concatenate all DataFrames column-wise
-    df_combined = pd.concat([df_radar, df_ax, df_ay, df_az], axis=1)
-    #df_combined = pd.concat([df_radar, df_adxl, df_ax, df_ay, df_az], axis=1)
+        # Concatenate all DataFrames column-wise
+        df_combined = pd.concat([df_radar, df_ax, df_ay, df_az], axis=1)
+        #df_combined = pd.concat([df_radar, df_adxl, df_ax, df_ay, df_az], axis=1)
 
-    filtered_data_df = pd.DataFrame({col: process(coefLPF50Hz, df_combined[col].values) for col in df_combined.columns})
+    with profiler.stage('lpf50_prepass'):
+        filtered_data_df = pd.DataFrame({col: process(Filters.coefLPF50Hz, df_combined[col].values) for col in df_combined.columns})
 
     # Detrend all the columns
-    df_combined_detrended = df_combined.apply(detrend)
+    with profiler.stage('detrend'):
+        df_combined_detrended = detrend_columns(df_combined, detrend_order)
   
     # Normalize all the columns
-    df_combined_normalized = (df_combined_detrended - df_combined_detrended.min()) / (df_combined_detrended.max() - df_combined_detrended.min())
+    with profiler.stage('normalize'):
+        df_combined_normalized = (df_combined_detrended - df_combined_detrended.min()) / (df_combined_detrended.max() - df_combined_detrended.min())
 
     # Convert list of dictionaries to DataFrame
     df_metadata = pd.DataFrame(metadata_list)
 
     # Select only the desired columns
     #desired_columns = ['TreeSec', 'TreeNo', 'InfStat', 'TreeID', 'RowNo', 'ScanNo', 'timestamp']
-    desired_columns = ['TreeNo', 'InfStat', 'TreeID', 'RowNo', 'ScanNo', 'timestamp']
+    desired_columns = ['TreeNo', 'InfStat', 'TreeID', 'RowNo', 'ScanNo', 'timestamp', 'SamplingRate', 'NaNCount', 'InvalidCount']
     df_metadata_filtered = df_metadata[desired_columns]
 
     # Construct file name based on user inputs
@@ -249,35 +291,53 @@ else:
     # Join file name parts with underscore
     file_name = '_'.join(file_name_parts)
 
-    # Convert DataFrame to Excel format
-    excel_data = BytesIO()
-    with pd.ExcelWriter(excel_data, engine='xlsxwriter') as writer:
+    def selected_excel_sheets():
+        # Generated while the workbook is written, so the feature sheets are
+        # only computed when an export is actually requested.
         if 'Raw Data' in selected_sheets:
-            df_combined.to_excel(writer, sheet_name='Raw Data', index=False)
+            yield 'Raw Data', df_combined
         if 'Detrended Data' in selected_sheets:
-            df_combined_detrended.to_excel(writer, sheet_name='Detrended Data', index=False)
+            yield 'Detrended Data', df_combined_detrended
         if 'Normalized Data' in selected_sheets:
-            df_combined_normalized.to_excel(writer, sheet_name='Normalized Data', index=False)
+            yield 'Normalized Data', df_combined_normalized
         if 'Detrended & Normalized Data' in selected_sheets:
             df_combined_detrended_normalized = (df_combined_detrended - df_combined_detrended.min()) / (df_combined_detrended.max() - df_combined_detrended.min())
-            df_combined_detrended_normalized.to_excel(writer, sheet_name='Detrended & Normalized Data', index=False)
+            yield 'Detrended & Normalized Data', df_combined_detrended_normalized
         if 'Metadata' in selected_sheets:
-            df_metadata_filtered.to_excel(writer, sheet_name='Metadata', index=False)
+            yield 'Metadata', df_metadata_filtered
         if 'Time Domain Features' in selected_sheets:
-            time_domain_features = stats_radar(df_combined_detrended)
-            time_domain_features.to_excel(writer, sheet_name='Time Domain Features', index=False)
+            yield 'Time Domain Features', time_domain_features(df_combined_detrended, burst_window, burst_threshold)
         if 'Frequency Domain Features' in selected_sheets:
-            frequencies, powers = fq(df_combined_detrended)
-            frequencies.to_excel(writer, sheet_name='Frequencies', index=False)
-            powers.to_excel(writer, sheet_name='Powers', index=False)
+            with profiler.stage('fq'):
+                frequencies, powers = fq(df_combined_detrended)
+            yield 'Frequencies', frequencies
+            yield 'Powers', powers
+        if 'Band Energy' in selected_sheets:
+            with profiler.stage('band_energy'):
+                band_energy = band_energy_features(df_combined_detrended, SAMPLING_RATE, band_edges(band_width, band_top))
+            yield 'Band Energy', band_energy
         if 'Columns Comparison' in selected_sheets:
-            columns_comparison = columns_reports_unique(df_combined_detrended)
-            columns_comparison.to_excel(writer, sheet_name='Columns Comparison', index=False)
-
-    excel_data.seek(0)
+            with profiler.stage('columns_reports_unique'):
+                columns_comparison = compare_columns(df_combined_detrended, max_lag, align_pairs)
+            yield 'Columns Comparison', columns_comparison
+        if profiler.rows:
+            # Stages up to this point; the full table, including the write itself, is below the page
+            yield 'Profile', profiler.to_dataframe()
+
+    # The workbook is built only when asked for, and kept for the download
+    # button until the query or the sheet selection changes.
+    export_key = (file_name, row_number, tree_number, scan_number, bucket_number, label_infstat, detrend_order, burst_window, burst_threshold, band_width, band_top, max_lag, align_pairs, tuple(selected_sheets))
+    if st.button('Prepare Excel File', key='prepare-excel'):
+        sheet_count = len(selected_sheets) + ('Frequency Domain Features' in selected_sheets) + bool(profile_stages)
+        export_progress = st.progress(0.0, text='Preparing Excel file')
+        with profiler.stage('xlsx_export'):
+            st.session_state['excel_export'] = (export_key, excel_bytes(selected_excel_sheets(), sheet_count, export_progress.progress))
+        export_progress.empty()
+    excel_export = st.session_state.get('excel_export')
 
     # Download button for selected sheets and metadata
-    st.download_button("Download Selected Sheets and Metadata", excel_data, file_name=f"{file_name}.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", key='download-excel')
+    if excel_export and excel_export[0] == export_key:
+        st.download_button("Download Selected Sheets and Metadata", excel_export[1], file_name=f"{file_name}.xlsx", mime=EXCEL_MIME, key='download-excel')
     #st.write("Columns in df_combined_detrended:", df_combined_detrended.columns)
   
     # Adding filter selection components
@@ -290,12 +350,12 @@ else:
 
     # Map selected filter type and frequency to the corresponding coefficients
     if filter_type == 'Low Pass Filter (LPF)':
-        filter_coef = globals()[f'coefLPF{frequency}Hz']
+        filter_coef = getattr(Filters, f'coefLPF{frequency}Hz')
     elif filter_type == 'High Pass Filter (HPF)':
-        filter_coef = globals()[f'coefHPF{frequency}Hz']
+        filter_coef = getattr(Filters, f'coefHPF{frequency}Hz')
     elif filter_type == 'Band Pass Filter (BPF)':
-        filter_coef_low = globals()[f'coefHPF{low_freq}Hz']
-        filter_coef_high = globals()[f'coefLPF{high_freq}Hz']
+        filter_coef_low = getattr(Filters, f'coefHPF{low_freq}Hz')
+        filter_coef_high = getattr(Filters, f'coefLPF{high_freq}Hz')
 
     # Apply the selected filter only to Radar and ADXL columns
     # List to hold all Radar and ADXL column names
@@ -313,14 +373,15 @@ else:
         #filtered_adxl_columns[f'ADXL {i}'] = df_combined_detrended[f'ADXL {i}']
 
     # Apply the process function on each column
-    if filter_type == 'Band Pass Filter (BPF)':
-        filtered_radar_data_low = pd.DataFrame({col: process(filter_coef_low, data.values) for col, data in filtered_radar_columns.items()})
-        filtered_radar_data = pd.DataFrame({col: process(filter_coef_high, data.values) for col, data in filtered_radar_data_low.items()})
-        #filtered_adxl_data_low = pd.DataFrame({col: process(filter_coef_low, data.values) for col, data in filtered_adxl_columns.items()})
-        #filtered_adxl_data = pd.DataFrame({col: process(filter_coef_high, data.values) for col, data in filtered_adxl_data_low.items()})
-    else:
-        filtered_radar_data = pd.DataFrame({col: process(filter_coef, data.values) for col, data in filtered_radar_columns.items()})
-        #filtered_adxl_data = pd.DataFrame({col: process(filter_coef, data.values) for col, data in filtered_adxl_columns.items()})
+    with profiler.stage('filter'):
+        if filter_type == 'Band Pass Filter (BPF)':
+            filtered_radar_data_low = pd.DataFrame({col: process(filter_coef_low, data.values) for col, data in filtered_radar_columns.items()})
+            filtered_radar_data = pd.DataFrame({col: process(filter_coef_high, data.values) for col, data in filtered_radar_data_low.items()})
+            #filtered_adxl_data_low = pd.DataFrame({col: process(filter_coef_low, data.values) for col, data in filtered_adxl_columns.items()})
+            #filtered_adxl_data = pd.DataFrame({col: process(filter_coef_high, data.values) for col, data in filtered_adxl_data_low.items()})
+        else:
+            filtered_radar_data = pd.DataFrame({col: process(filter_coef, data.values) for col, data in filtered_radar_columns.items()})
+            #filtered_adxl_data = pd.DataFrame({col: process(filter_coef, data.values) for col, data in filtered_adxl_columns.items()})
 
 filtered_data = pd.concat([filtered_radar_data], axis=1)
 #filtered_data = pd.concat([filtered_radar_data, filtered_adxl_data], axis=1)
@@ -331,27 +392,76 @@ selected_sheets = st.multiselect('Select Sheets to Download', ['Filtered Data',
 
 # Add a button to trigger the download
 if st.button("Download Selected Sheets"):
-    # Prepare the Excel file with selected sheets
-    filtered_excel_data = BytesIO()
-    with pd.ExcelWriter(filtered_excel_data, engine='xlsxwriter') as writer:
+    def selected_filtered_sheets():
         for sheet_name in selected_sheets:
-            # Write each selected sheet to the Excel file
             if sheet_name == 'Filtered Data':
-                # Write filtered data to the sheet
-                filtered_data.to_excel(writer, sheet_name=sheet_name, index=False)
+                yield sheet_name, filtered_data
             elif sheet_name == 'Time Domain Features':
                 # Apply the time domain features on the filtered data
-                time_domain_features_filtered = stats_radar(filtered_data)
-                # Write time domain features data to the sheet
-                time_domain_features_filtered.to_excel(writer, sheet_name=sheet_name, index=False)
+                time_domain_features_filtered = time_domain_features(filtered_data, burst_window, burst_threshold)
+                yield sheet_name, time_domain_features_filtered
             elif sheet_name == 'Columns Comparison':
                 # Apply the columns comparison on the filtered data
-                columns_comparison_filtered = columns_reports_unique(filtered_data)
-                # Write column comparison data to the sheet
-                columns_comparison_filtered.to_excel(writer, sheet_name=sheet_name, index=False)
+                with profiler.stage('columns_reports_unique'):
+                    columns_comparison_filtered = compare_columns(filtered_data, max_lag, align_pairs)
+                yield sheet_name, columns_comparison_filtered
 
-    # Set the pointer to the beginning of the file
-    filtered_excel_data.seek(0)
+    # Prepare the Excel file with selected sheets
+    export_progress = st.progress(0.0, text='Preparing Excel file')
+    with profiler.stage('filtered_xlsx_export'):
+        filtered_excel_data = excel_bytes(selected_filtered_sheets(), len(selected_sheets), export_progress.progress)
+    export_progress.empty()
 
     # Trigger the download of the Excel file
-    st.download_button("Download Filtered Data", filtered_excel_data, file_name=f"Filtered_{filter_type.replace(' ', '')}{frequency if filter_type != 'Band Pass Filter (BPF)' else f'{low_freq}to{high_freq}'}Hz.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", key='download-filtered-excel')
+    st.download_button("Download Filtered Data", filtered_excel_data, file_name=f"Filtered_{filter_type.replace(' ', '')}{frequency if filter_type != 'Band Pass Filter (BPF)' else f'{low_freq}to{high_freq}'}Hz.xlsx", mime=EXCEL_MIME, key='download-filtered-excel')
+
+# Columnar export: the same datasets as separate Parquet/Arrow files or one NPZ, in a ZIP
+st.subheader('Columnar Export')
+columnar_format = st.selectbox('Export Format', columnar_formats(), key='columnar-format')
+columnar_datasets = st.multiselect('Select Datasets', ['Raw', 'Detrended', 'Normalized', 'Filtered', 'Time Domain Features', 'Spectra', 'Band Energy', 'Metadata'], default=['Raw', 'Filtered', 'Metadata'])
+
+def selected_columnar_datasets():
+    if 'Raw' in columnar_datasets:
+        yield 'raw', df_combined
+    if 'Detrended' in columnar_datasets:
+        yield 'detrended', df_combined_detrended
+    if 'Normalized' in columnar_datasets:
+        yield 'normalized', df_combined_normalized
+    if 'Filtered' in columnar_datasets:
+        yield 'filtered', filtered_data
+    if 'Time Domain Features' in columnar_datasets:
+        yield 'time_domain_features', time_domain_features(df_combined_detrended, burst_window, burst_threshold)
+    if 'Spectra' in columnar_datasets:
+        with profiler.stage('fq'):
+            frequencies, powers = fq(df_combined_detrended)
+        yield 'frequencies', frequencies
+        yield 'powers', powers
+    if 'Band Energy' in columnar_datasets:
+        with profiler.stage('band_energy'):
+            band_energy = band_energy_features(df_combined_detrended, SAMPLING_RATE, band_edges(band_width, band_top))
+        yield 'band_energy', band_energy
+    if 'Metadata' in columnar_datasets:
+        yield 'metadata', df_metadata_filtered
+
+filter_setting = (low_freq, high_freq) if filter_type == 'Band Pass Filter (BPF)' else frequency
+columnar_key = (row_number, tree_number, scan_number, bucket_number, label_infstat, detrend_order, burst_window, burst_threshold, band_width, band_top, filter_type, filter_setting,
+                columnar_format, tuple(columnar_datasets))
+if st.button('Prepare ZIP', key='prepare-columnar'):
+    export_progress = st.progress(0.0, text='Preparing ZIP')
+    with profiler.stage('columnar_export'):
+        dataset_count = len(columnar_datasets) + ('Spectra' in columnar_datasets)
+        st.session_state['columnar_export'] = (columnar_key, columnar_zip(selected_columnar_datasets(), columnar_format, dataset_count, export_progress.progress))
+    export_progress.empty()
+columnar_export = st.session_state.get('columnar_export')
+if columnar_export and columnar_export[0] == columnar_key:
+    suffix = COLUMNAR_FORMATS[columnar_format].lstrip('.')
+    st.download_button(f"Download {columnar_format} ZIP", columnar_export[1], file_name=f"{file_name or 'BT_Classic'}_{suffix}.zip", mime=ZIP_MIME, key='download-columnar')
+
+# Stage timings for this rerun, with a CSV export to attach to the Excel file
+if profiler.rows:
+    profile_df = profiler.to_dataframe()
+    with st.expander('Stage timings', expanded=True):
+        st.dataframe(profile_df, hide_index=True)
+        st.download_button("Download Stage Timings", profile_df.to_csv(index=False), file_name="Stage_Timings.csv", mime="text/csv", key='download-profile')
+
+show_instrumentation_panel(page_run)
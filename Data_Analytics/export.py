@@ -0,0 +1,197 @@
+import datetime
+import importlib.util
+import io
+import zipfile
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+EXCEL_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Rows converted from NumPy to Python values at a time.
+ROW_BLOCK = 2000
+
+
+def _float_cells(block):
+    # NaN becomes an empty cell and +/-inf the text pandas writes for it.
+    if np.isfinite(block).all():
+        return block.tolist()
+    cells = block.astype(object)
+    cells[np.isnan(block)] = None
+    cells[np.isposinf(block)] = "inf"
+    cells[np.isneginf(block)] = "-inf"
+    return cells.tolist()
+
+
+def _column_arrays(df):
+    columns = []
+    for _, series in df.items():
+        if pd.api.types.is_float_dtype(series.dtype):
+            columns.append(("float", series.to_numpy(dtype=float)))
+        elif pd.api.types.is_integer_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+            columns.append(("int", series.to_numpy()))
+        else:
+            # A copy: for object columns to_numpy can hand back the frame's own
+            # (possibly read-only) buffer.
+            values = series.to_numpy(dtype=object, copy=True)
+            values[pd.isna(values)] = None
+            columns.append(("object", values))
+    return columns
+
+
+def _row_blocks(df):
+    # Lists of rows, ROW_BLOCK at a time. All-float frames (the signal sheets)
+    # are converted straight from one 2-D array.
+    rows = len(df)
+    if len(df.columns) and all(pd.api.types.is_float_dtype(dtype) for dtype in df.dtypes):
+        values = df.to_numpy(dtype=float)
+        for start in range(0, rows, ROW_BLOCK):
+            yield start, _float_cells(values[start:start + ROW_BLOCK])
+        return
+    columns = _column_arrays(df)
+    for start in range(0, rows, ROW_BLOCK):
+        cells = [
+            _float_cells(values[start:start + ROW_BLOCK]) if kind == "float" else values[start:start + ROW_BLOCK].tolist()
+            for kind, values in columns
+        ]
+        yield start, list(zip(*cells))
+
+
+def write_sheet(workbook, sheet_name, df, progress=None):
+    # Rows go out strictly in order, which constant_memory mode requires.
+    worksheet = workbook.add_worksheet(sheet_name)
+    worksheet.write_row(0, 0, [str(column) for column in df.columns])
+    rows = len(df)
+    for start, block in _row_blocks(df):
+        for offset, row in enumerate(block):
+            worksheet.write_row(start + offset + 1, 0, row)
+        if progress:
+            progress(min(start + ROW_BLOCK, rows) / rows)
+    return worksheet
+
+
+def excel_bytes(sheets, sheet_count=None, progress=None):
+    """Write (sheet name, DataFrame) pairs to an .xlsx file and return its bytes.
+
+    The workbook is written in xlsxwriter's constant_memory mode: each row is
+    flushed to a temporary file as soon as it is written, so memory does not
+    grow with the row count. sheets may be a generator, so sheets that need
+    computing are only computed while the file is built. progress, if given,
+    is called as progress(fraction, text), like st.progress.
+    """
+    output = io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {
+        "constant_memory": True,
+        "nan_inf_to_errors": True,
+        "default_date_format": "yyyy-mm-dd hh:mm:ss",
+    })
+    for index, (sheet_name, df) in enumerate(sheets):
+        if progress:
+            def sheet_progress(fraction, index=index, sheet_name=sheet_name):
+                done = (index + fraction) / sheet_count if sheet_count else fraction
+                progress(min(done, 1.0), f"Writing {sheet_name}")
+            sheet_progress(0.0)
+        else:
+            sheet_progress = None
+        write_sheet(workbook, sheet_name, df, sheet_progress)
+    workbook.close()
+    if progress:
+        progress(1.0, "Done")
+    return output.getvalue()
+
+
+# Columnar bundles: every dataset as its own file inside one ZIP.
+ZIP_MIME = "application/zip"
+COLUMNAR_FORMATS = {
+    "Parquet": ".parquet",
+    "Arrow IPC": ".arrow",
+    "NPZ": ".npz",
+}
+
+
+def columnar_formats():
+    # Parquet and Arrow IPC need pyarrow, which is optional for this app.
+    if importlib.util.find_spec("pyarrow") is None:
+        return ["NPZ"]
+    return list(COLUMNAR_FORMATS)
+
+
+def _arrow_table(df):
+    import pyarrow as pa
+    df = df.rename(columns=str)
+    if df.columns.has_duplicates:
+        raise ValueError(f"Duplicate column names: {list(df.columns[df.columns.duplicated()])}")
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        # Metadata fields can mix types across documents (e.g. TreeID as int
+        # and str); such columns are written as text.
+        mixed = df.select_dtypes(include="object").columns
+        df = df.astype({column: str for column in mixed}).where(df.notna(), None)
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def parquet_bytes(df, compression="zstd"):
+    import pyarrow.parquet as pq
+    output = io.BytesIO()
+    pq.write_table(_arrow_table(df), output, compression=compression)
+    return output.getvalue()
+
+
+def arrow_ipc_bytes(df, compression="zstd"):
+    import pyarrow as pa
+    table = _arrow_table(df)
+    output = io.BytesIO()
+    with pa.ipc.new_file(output, table.schema, options=pa.ipc.IpcWriteOptions(compression=compression)) as writer:
+        writer.write_table(table)
+    return output.getvalue()
+
+
+def npz_arrays(name, df):
+    # An all-numeric frame is one 2-D array plus its column names; anything
+    # else is one array per column. Text is stored as fixed-width unicode so
+    # the file loads without allow_pickle.
+    if len(df.columns) and all(pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes):
+        return {name: df.to_numpy(), f"{name}.columns": np.array([str(c) for c in df.columns])}
+    arrays = {}
+    for column, series in df.items():
+        if series.dtype.kind in "biufcmM":
+            values = series.to_numpy()
+        elif series.map(lambda v: isinstance(v, datetime.datetime)).any():
+            values = pd.to_datetime(series).to_numpy()
+        else:
+            values = series.where(series.notna(), "").astype(str).to_numpy(dtype=str)
+        arrays[f"{name}.{column}"] = values
+    return arrays
+
+
+def columnar_zip(datasets, fmt, dataset_count=None, progress=None):
+    """Write (name, DataFrame) pairs into one ZIP and return its bytes.
+
+    Parquet and Arrow IPC give one zstd-compressed file per dataset; NPZ
+    gives a single compressed .npz holding every dataset's arrays. Frames
+    are handed to pyarrow/NumPy whole, with no per-cell conversion.
+    """
+    output = io.BytesIO()
+    # The members are compressed already, so they are stored as-is.
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED) as bundle:
+        arrays = {}
+        for index, (name, df) in enumerate(datasets):
+            if progress:
+                progress(index / dataset_count if dataset_count else 0.0, f"Writing {name}")
+            if fmt == "Parquet":
+                bundle.writestr(name + COLUMNAR_FORMATS[fmt], parquet_bytes(df))
+            elif fmt == "Arrow IPC":
+                bundle.writestr(name + COLUMNAR_FORMATS[fmt], arrow_ipc_bytes(df))
+            elif fmt == "NPZ":
+                arrays.update(npz_arrays(name, df))
+            else:
+                raise ValueError(f"Unknown export format {fmt!r}")
+        if fmt == "NPZ":
+            npz = io.BytesIO()
+            np.savez_compressed(npz, **arrays)
+            bundle.writestr("datasets.npz", npz.getvalue())
+    if progress:
+        progress(1.0, "Done")
+    return output.getvalue()
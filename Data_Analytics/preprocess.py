@@ -1,20 +1,104 @@
 import pandas as pd 
 import numpy as np
 import pandas as pd
-from scipy import signal
-from scipy.stats import skew, kurtosis
+from collections import defaultdict
+from fractions import Fraction
+from functools import lru_cache
+from trebirth.lazy import lazy_import
+
+# scipy is imported on first use, not when the page loads.
+signal = lazy_import('scipy.signal')
+scipy_stats = lazy_import('scipy.stats')
+
+# Rate the Filters.py coefficients and the spectra are designed for; scans
+# from other devices are resampled to it.
+SAMPLING_RATE = 100
+
+def scan_rate(doc, default=SAMPLING_RATE):
+    # SamplingRate from the scan's metadata; older documents don't have one.
+    try:
+        rate = float(doc.get('SamplingRate', default))
+    except (TypeError, ValueError):
+        return default
+    return rate if rate > 0 else default
+
+def resample_scans(scans, rates, target_rate=SAMPLING_RATE, validated=False):
+    # Bring every scan to target_rate with polyphase filtering. Scans already
+    # at target_rate are returned as they are; the others are grouped by
+    # (rate, length) and each group is resampled as one 2-D batch.
+    # validated=True: scans are clean float arrays (trebirth.validation).
+    resampled = list(scans)
+    groups = defaultdict(list)
+    for i, (scan, rate) in enumerate(zip(scans, rates)):
+        if rate == target_rate or len(scan) == 0:
+            continue
+        if validated:
+            values = np.asarray(scan, dtype=float)
+        else:
+            values = pd.to_numeric(pd.Series(scan), errors='coerce').to_numpy(dtype=float)
+            values = values[np.isfinite(values)]
+        groups[(rate, len(values))].append((i, values))
+    for (rate, length), members in groups.items():
+        ratio = Fraction(target_rate) / Fraction(rate).limit_denominator(1000)
+        if length == 0:
+            for i, values in members:
+                resampled[i] = values
+            continue
+        batch = np.stack([values for _, values in members])
+        output = signal.resample_poly(batch, ratio.numerator, ratio.denominator, axis=1)
+        for (i, _), row in zip(members, output):
+            resampled[i] = row
+    return resampled
 
 def detrend(dataframe):
     detrended_data = dataframe - dataframe.mean()
     return detrended_data
 
+@lru_cache(maxsize=32)
+def polynomial_basis(n, order):
+    # Orthonormal basis (n x order+1) of polynomials up to order on n samples;
+    # Q @ Q.T projects onto them. Built on [-1, 1] so high orders stay well conditioned.
+    x = np.linspace(-1, 1, n)
+    q, _ = np.linalg.qr(np.vander(x, order + 1, increasing=True))
+    q.setflags(write=False)
+    return q
+
+def detrend_columns(df, order=1):
+    # Remove the least-squares polynomial of the given order from every column.
+    # Columns are grouped by length (shorter scans are NaN-padded at the end by
+    # the concat) and each group is detrended with one pair of matrix products.
+    # order=0 is the same as detrend(): the mean is subtracted.
+    values = df.to_numpy(dtype=float)
+    result = np.full_like(values, np.nan)
+    valid = ~np.isnan(values)
+    lengths = valid.sum(axis=0)
+    groups = defaultdict(list)
+    for i, length in enumerate(lengths):
+        if valid[:length, i].all():
+            groups[int(length)].append(i)
+        else:
+            # Gaps inside the scan: fit on the samples that are there.
+            x = np.linspace(-1, 1, len(values))[valid[:, i]]
+            y = values[valid[:, i], i]
+            if len(y) > order:
+                result[valid[:, i], i] = y - np.polyval(np.polyfit(x, y, order), x)
+    for length, columns in groups.items():
+        if length <= order:
+            # Too short to fit; a polynomial through every point leaves zeros.
+            result[:length, columns] = 0.0
+            continue
+        q = polynomial_basis(length, order)
+        block = values[:length, columns]
+        result[:length, columns] = block - q @ (q.T @ block)
+    return pd.DataFrame(result, index=df.index, columns=df.columns)
+
 # Define feature extraction functions
-def fq(df):
+def fq(df, fs=SAMPLING_RATE):
     frequencies = []
     powers = []
 
     for i in df.columns:
-        f, p = signal.welch(df[i], 100, 'flattop', 850, scaling='spectrum')
+        f, p = signal.welch(np.asarray(df[i], dtype=float), fs, 'flattop', 850, scaling='spectrum')
         frequencies.append(f[1:])
         powers.append(p[1:])
 
@@ -22,21 +106,25 @@ def fq(df):
     powers_df = pd.DataFrame(powers).transpose()
     return frequencies_df, powers_df
 
-def stats_radar(df):
+def stats_radar(df, validated=False):
     result_df = pd.DataFrame()
+    if validated:
+        # Numeric already; only the NaN padding of shorter scans is filled, in one go.
+        df = df.fillna(df.mean())
 
     for column in df.columns:
         column_list, std_list, ptp_list, median_list, mean_list, Skewness_list, Kurtosis_list, Min_list, Max_list = [], [], [], [], [], [], [], [], []
-        df[column] = pd.to_numeric(df[column], errors='coerce')
-        df[column].fillna(df[column].mean(), inplace=True)
+        if not validated:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+            df[column].fillna(df[column].mean(), inplace=True)
 
         
         std_value = np.std(df[column])
         ptp_value = np.ptp(df[column])
         mean_value = np.mean(df[column])
         median_value = np.median(df[column])
-        Skewness_value = skew(df[column])
-        Kurtosis_value = kurtosis(df[column])
+        Skewness_value = scipy_stats.skew(df[column])
+        Kurtosis_value = scipy_stats.kurtosis(df[column])
         Min_value = np.min(df[column])
         Max_value = np.max(df[column])
         #rms_value = np.sqrt(np.mean(df[column]**2))
@@ -67,24 +155,25 @@ def stats_radar(df):
         result_df = pd.concat([result_df, column_result_df], axis=0)
     return result_df
     
-def calculate_statistics(df):
-    df = df.apply(pd.to_numeric, errors='coerce')
-    df.fillna(df.median(), inplace=True)
+def calculate_statistics(df, validated=False):
+    if not validated:
+        df = df.apply(pd.to_numeric, errors='coerce')
+    df = df.fillna(df.median())
     stats = {
         'Column': df.columns,
         'Mean': df.mean(),
         'Median': df.median(),
         'Std Deviation': df.std(),
         'PTP': df.apply(lambda x: np.ptp(x)),
-        'Skewness': skew(df),
-        'Kurtosis': kurtosis(df),
+        'Skewness': scipy_stats.skew(df),
+        'Kurtosis': scipy_stats.kurtosis(df),
         'Min': df.min(),
         'Max': df.max()
     }
     stats_df = pd.DataFrame(stats)
     return stats_df
 
-def stats_filtereddata(df, band):
+def stats_filtereddata(df, band, validated=False):
     stats = {
         "Band": [],
         "STD": [],
@@ -95,35 +184,46 @@ def stats_filtereddata(df, band):
         "Kurtosis": []
     }
 
+    if validated:
+        df = df.fillna(df.mean())
+
     for column in df.columns:
         # Ensure the column is numeric and handle NaN values
-        df[column] = pd.to_numeric(df[column], errors='coerce')
-        df[column].fillna(df[column].mean(), inplace=True)
+        if not validated:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+            df[column].fillna(df[column].mean(), inplace=True)
       
         stats["Band"].append(f"{band} {column}")
         stats["STD"].append(np.std(df[column]))
         stats["PTP"].append(np.ptp(df[column]))
         stats["Mean"].append(np.mean(df[column]))
         stats["RMS"].append(np.sqrt(np.mean(df[column]**2)))
-        stats["Skew"].append(skew(df[column]))
-        stats["Kurtosis"].append(kurtosis(df[column]))
+        stats["Skew"].append(scipy_stats.skew(df[column]))
+        stats["Kurtosis"].append(scipy_stats.kurtosis(df[column]))
 
     return pd.DataFrame(stats)
 
 # Define function to compare columns
-def columns_reports_unique(df):
+def columns_reports_unique(df, lags=None):
+    # lags: {(column 1, column 2): lag} from correlation.cross_correlation; each
+    # pair is then compared with Column 2 shifted by its lag, on the samples
+    # the two have in common.
     report = []
     num_columns = len(df.columns)
     for i in range(num_columns):
         for j in range(i + 1, num_columns):  # Start j from i + 1
             column1 = df.columns[i]
             column2 = df.columns[j]
-            diff = df[column1] - df[column2]
+            pair = df[[column1, column2]]
+            if lags is not None:
+                pair = pd.DataFrame({'1': df[column1], '2': df[column2].shift(int(lags[(column1, column2)]))}).dropna()
+                pair.columns = [column1, column2]
+            diff = pair.iloc[:, 0] - pair.iloc[:, 1]
             mean_diff = np.mean(diff)
             deviation_diff = np.std(diff)
             ptp_diff = np.ptp(diff)
-            skewness_diff = skew(diff)
-            correlation = df[[column1, column2]].corr().iloc[0, 1]
+            skewness_diff = scipy_stats.skew(diff)
+            correlation = pair.corr().iloc[0, 1]
             report.append({
                 'Column 1': column1,
                 'Column 2': column2,
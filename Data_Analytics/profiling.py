@@ -0,0 +1,127 @@
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+# tracemalloc is global to the process, so profilers in concurrent sessions
+# share it: it runs while any profiler has a stage open and stops when the
+# last one closes. Peaks are only reset, and only reported, by a profiler
+# that had tracing to itself; _trace_epoch moves on whenever another
+# profiler starts tracing, so a stage can tell that it was shared.
+_trace_lock = threading.Lock()
+_trace_users = 0
+_trace_epoch = 0
+_trace_started = False
+
+
+def _acquire_tracing():
+    global _trace_users, _trace_epoch, _trace_started
+    with _trace_lock:
+        if _trace_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _trace_started = True
+        _trace_users += 1
+        _trace_epoch += 1
+        return _trace_epoch
+
+
+def _release_tracing():
+    global _trace_users, _trace_started
+    with _trace_lock:
+        _trace_users -= 1
+        if _trace_users == 0 and _trace_started:
+            tracemalloc.stop()
+            _trace_started = False
+
+
+def _reset_peak(epoch):
+    # Current traced memory, after resetting the peak if tracing is still ours alone.
+    with _trace_lock:
+        current = tracemalloc.get_traced_memory()[0]
+        if _trace_users == 1 and _trace_epoch == epoch:
+            tracemalloc.reset_peak()
+            return current, True
+        return current, False
+
+
+class StageProfiler:
+    """Wall time, CPU time and peak traced memory for each pipeline stage.
+
+    Stages may nest (e.g. stats_radar inside the Excel write); a parent's peak
+    includes its children. Memory is traced only while an outermost stage is
+    open, and its peak is left blank for stages that ran while another
+    session was tracing too. Hooks are called with each finished stage's row.
+    """
+
+    def __init__(self, enabled=True, trace_memory=True, hooks=None):
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.hooks = list(hooks or [])
+        self.rows = []
+        self._stack = []
+        self._epoch = None
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        tracing = self.trace_memory
+        if tracing and not self._stack:
+            self._epoch = _acquire_tracing()
+        if tracing:
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], tracemalloc.get_traced_memory()[1])
+            current, own = _reset_peak(self._epoch)
+        else:
+            current, own = 0, False
+        frame = {"start_memory": current, "peak": current, "own": own}
+        self._stack.append(frame)
+        # Reserve the row now so the table is in call order, parents first.
+        index = len(self.rows)
+        self.rows.append(None)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            self._stack.pop()
+            row = {
+                "Stage": name,
+                "Depth": len(self._stack),
+                "Wall (s)": round(wall, 4),
+                "CPU (s)": round(cpu, 4),
+            }
+            if tracing:
+                peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+                own = frame["own"] and _trace_epoch == self._epoch
+                row["Peak memory (MB)"] = round((peak - frame["start_memory"]) / 1e6, 3) if own else None
+                if self._stack:
+                    self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+                else:
+                    _release_tracing()
+            self.rows[index] = row
+            for hook in self.hooks:
+                hook(row)
+
+    def wrap(self, name, function):
+        # Profile every call of function as stage name.
+        def profiled(*args, **kwargs):
+            with self.stage(name):
+                return function(*args, **kwargs)
+        return profiled
+
+    def to_dataframe(self):
+        df = pd.DataFrame([row for row in self.rows if row is not None])
+        if not df.empty:
+            # Indent nested stages so the table reads like a call tree.
+            df["Stage"] = ["    " * depth + stage for stage, depth in zip(df["Stage"], df["Depth"])]
+            df = df.drop(columns="Depth")
+        return df
@@ -0,0 +1,73 @@
+import numpy as np
+
+
+def _fft_size(taps, block_size=None):
+    # Power of two with room for at least taps new samples per transform,
+    # unless a block size (new samples per transform) is asked for.
+    wanted = (block_size or taps) + taps - 1
+    return 1 << (wanted - 1).bit_length()
+
+
+class OverlapSaveFilter:
+    """FIR filter over an unbounded signal, fed one chunk at a time.
+
+    Uses FFT overlap-save: the last len(coef) - 1 input samples are carried
+    between chunks, so the concatenated output equals filtering the whole
+    recording at once (scipy.signal.lfilter(coef, 1, x)) for any chunking.
+    Chunks may be (samples,) or (channels, samples); time is the last axis
+    and all channels are transformed together.
+
+        lpf = OverlapSaveFilter(Filters.coefLPF50Hz)
+        for chunk in radar_chunks:
+            filtered = lpf.process(chunk)
+    """
+
+    def __init__(self, coef, block_size=None):
+        self.coef = np.asarray(coef, dtype=float)
+        self.taps = len(self.coef)
+        self.nfft = _fft_size(self.taps, block_size)
+        # New samples consumed by each transform.
+        self.step = self.nfft - self.taps + 1
+        self._response = np.fft.rfft(self.coef, self.nfft)
+        self._history = None
+        self.samples_seen = 0
+
+    def reset(self):
+        # Forget the carried samples, as if the stream started again.
+        self._history = None
+        self.samples_seen = 0
+
+    def process(self, chunk):
+        chunk = np.asarray(chunk, dtype=float)
+        n = chunk.shape[-1]
+        if self._history is None:
+            # The signal is taken to be zero before the first sample.
+            self._history = np.zeros(chunk.shape[:-1] + (self.taps - 1,))
+        elif self._history.shape[:-1] != chunk.shape[:-1]:
+            raise ValueError(f"Chunk shape {chunk.shape} does not match the stream's channels {self._history.shape[:-1]}")
+        if n == 0:
+            return chunk.copy()
+
+        segments = -(-n // self.step)
+        # History, the chunk, and zeros up to a whole number of segments; the
+        # padding only affects outputs that are thrown away.
+        padded = np.concatenate([
+            self._history, chunk, np.zeros(chunk.shape[:-1] + (segments * self.step - n,)),
+        ], axis=-1)
+        # Overlapping windows of nfft samples, one step apart: (..., segments, nfft).
+        windows = np.lib.stride_tricks.sliding_window_view(padded, self.nfft, axis=-1)[..., ::self.step, :]
+        spectra = np.fft.rfft(windows, axis=-1) * self._response
+        # The first taps - 1 outputs of each window are wrapped around; the rest are exact.
+        out = np.fft.irfft(spectra, self.nfft, axis=-1)[..., self.taps - 1:]
+        out = out.reshape(chunk.shape[:-1] + (segments * self.step,))[..., :n]
+
+        self._history = padded[..., n:n + self.taps - 1].copy()
+        self.samples_seen += n
+        return out
+
+
+def stream_filter(coef, chunks, block_size=None):
+    # Filter an iterable of chunks lazily, yielding one output chunk per input chunk.
+    fir = OverlapSaveFilter(coef, block_size)
+    for chunk in chunks:
+        yield fir.process(chunk)
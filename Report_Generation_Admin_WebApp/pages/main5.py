@@ -1,5 +1,4 @@
 import streamlit as st
-from google.cloud import firestore
 import pandas as pd
 from google.cloud.firestore import FieldFilter
 from io import BytesIO
@@ -9,6 +8,7 @@ import numpy as np
 import time
 import zipfile
 import os
+import sys
 import pytz
 import random
 from scipy import signal
@@ -17,19 +17,19 @@ from collections import defaultdict
 import matplotlib.dates as mdates
 import plotly.express as px
 import plotly.graph_objects as go
-from google.api_core.exceptions import ResourceExhausted, RetryError
-from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak, Table, TableStyle
+from reportlab.platypus import Paragraph, Spacer, PageBreak, Table, TableStyle
 from reportlab.pdfgen import canvas
 from reportlab.graphics.shapes import Line
-import tempfile
 import base64
-import plotly.io as pio
 from reportlab.lib.units import inch
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from trebirth.executor import get_executor
+from trebirth.firestore_client import get_client
+from trebirth.instrumentation import start_page_run, show_instrumentation_panel
+from trebirth.report_engine import report_styles, ReportImages, build_pdf
+from trebirth.timestamps import add_local_dates
 
 st.set_page_config(layout="wide")
 # Redirect to login page if not authenticated
@@ -39,9 +39,12 @@ if "authenticated" not in st.session_state or not st.session_state["authenticate
 
 st.write(f"Welcome, {st.session_state.username}!")
 
-# Initialize Firestore
-cred_path = "Report_Generation_Admin_WebApp/testdata1-20ec5-firebase-adminsdk-an9r6-d15c118c96.json"
-db = firestore.Client.from_service_account_json(cred_path)
+# Initialize Firestore (one shared client per server process)
+# The service account key shipped with this app, found from the page file so the working directory does not matter
+db = get_client(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "testdata1-20ec5-firebase-adminsdk-an9r6-d15c118c96.json"))
+executor = get_executor()
+# Firestore usage of this rerun, shown in the sidebar panel at the end of the page
+page_run = start_page_run('admin_report')
     # Your existing web app code starts here...
 #st.title('Test Analysis Report')
 st.markdown(
@@ -55,33 +58,6 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-def exponential_backoff(retries):
-    base_delay = 1
-    max_delay = 60
-    delay = base_delay * (2 ** retries) + random.uniform(0, 1)
-    return min(delay, max_delay)
-
-def get_firestore_data(query):
-    retries = 0
-    max_retries = 10
-    while retries < max_retries:
-        try:
-            results = query.stream()
-            return list(results)
-        except ResourceExhausted as e:
-            st.warning(f"Quota exceeded, retrying... (attempt {retries + 1})")
-            time.sleep(exponential_backoff(retries))
-            retries += 1
-        except RetryError as e:
-            st.warning(f"Retry error: {e}, retrying... (attempt {retries + 1})")
-            time.sleep(exponential_backoff(retries))
-            retries += 1
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
-            break
-    raise Exception("Max retries exceeded")
-
-db = firestore.Client.from_service_account_json("WEBB_APP_TREBIRTH/testdata1-20ec5-firebase-adminsdk-an9r6-a87cacba1d.json")
 query = db.collection('demo_db') 
 
 def convert_to_local_time(timestamp, timezone='Asia/Kolkata'):
@@ -144,7 +120,7 @@ def plot_time_domain(preprocessed_scan, device_name, timestamp, scan_duration, s
 
   
 def fetch_data():
-    docs = query.stream()
+    docs = executor.stream(query, name='demo_db')
     
     locations = set()
     companies = set()
@@ -155,14 +131,10 @@ def fetch_data():
         if "Report Location" in data and "Tests were carried out by" in data:
             locations.add(data["Report Location"].strip())
             companies.add(data["Tests were carried out by"].strip())
-            
-            # Extracting date from timestamp
-            timestamp = data.get("timestamp")
-            scan_date = datetime.utcfromtimestamp(timestamp.timestamp()).strftime('%Y-%m-%d') if timestamp else "Unknown Date"
-            
-            data["scan_date"] = scan_date  # Add extracted date to data
             scans_data.append(data)
-    
+
+    # Extract the UTC scan date for all scans in one pass
+    add_local_dates(scans_data, tz="UTC")
     return sorted(locations), sorted(companies), scans_data
 
 locations, companies, scans_data = fetch_data()
@@ -173,38 +145,15 @@ selected_locations = st.multiselect("Select Report Location:", locations)
 selected_companies = st.multiselect("Select Company:", companies)
 
 def generate_pdf():
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmpfile:
-        pdf_path = tmpfile.name
-    
-    doc = SimpleDocTemplate(pdf_path, pagesize=A4)
-    styles = getSampleStyleSheet()
-
-    # Apply Times New Roman font
-    pdfmetrics.registerFont(TTFont('ARLRDBD', 'Report_Generation_Web_App/ARLRDBD.TTF'))
-    pdfmetrics.registerFont(TTFont('ARIAL', 'Report_Generation_Web_App/ARIAL.TTF'))
-    styles["Heading1"].fontName = 'ARLRDBD'
-    styles["Normal"].fontName = 'ARIAL'
-    
-    heading_style_centered = ParagraphStyle(
-        "HeadingStyleCentered", parent=styles["Heading1"], fontSize=20, textColor=colors.darkblue,
-        alignment=1, spaceAfter=10, underline=True, bold=True,
-    )
-
-    heading_style_left = ParagraphStyle(
-        "HeadingStyleLeft", parent=styles["Heading1"], fontSize=20, textColor=colors.darkblue,
-        alignment=0, spaceAfter=10, underline=True, bold=True,  # alignment=0 for left alignment
-    )
-
-    heading_style_sub = ParagraphStyle(
-        "HeadingStyleLeft", parent=styles["Heading1"], fontSize=16, textColor=colors.black,
-        alignment=0, spaceAfter=10, underline=True, bold=True,  # alignment=0 for left alignment
-    )
-    
-    body_style = styles["Normal"]
-    body_style.fontSize = 12
-    bold_style = ParagraphStyle("BoldStyle", parent=body_style, fontSize=12, fontName="ARLRDBD")
+    styles = report_styles()
+    heading_style_centered = styles["heading_centered"]
+    heading_style_left = styles["heading_left"]
+    heading_style_sub = styles["heading_sub"]
+    body_style = styles["body"]
+    bold_style = styles["bold"]
+    # One image store per report, so identical plots are embedded once
+    images = ReportImages()
 
-    
     elements = []
     elements.append(Paragraph("TERMATRAC TEST REPORT", heading_style_centered))
     elements.append(Paragraph("SUPPLEMENT TO TIMBER PEST REPORT", heading_style_centered))
@@ -285,12 +234,8 @@ def generate_pdf():
                     # Generate the time domain plot
                     fig = plot_time_domain(processed_scan, device_name, timestamp, scan_duration)
                 
-                    # Save the plot as an image
-                    img_path = f"{tempfile.gettempdir()}/time_domain_plot.png"
-                    pio.write_image(fig, img_path, format="png")
-
-                    # Add the image to the PDF
-                    elements.append(Image(img_path, width=400, height=300))
+                    # Render the plot in memory and add it to the PDF
+                    elements.append(images.plot(fig, width=400, height=300))
                     elements.append(Spacer(1, 20))  # Space after image
 
                     # Add additional device info below the graph
@@ -333,19 +278,14 @@ def generate_pdf():
     # Final page line and page number
     elements.append(Spacer(1, 10))  # Leave space before the line
     
-    doc.build(elements)
-    # Remove temporary image file after generating PDF
-    os.remove(img_path)
-    return pdf_path
-    return
+    return build_pdf(elements)
 if st.button("Generate PDF Report"):
-    pdf_file = generate_pdf()
-    
-    with open(pdf_file, "rb") as file:
-        st.download_button(
-            label="Download PDF",
-            data=file,
-            file_name="Trebirth_Termatrac_Test_Report.pdf",
-            mime="application/pdf",
-        )
+    pdf_bytes = generate_pdf()
+    st.download_button(
+        label="Download PDF",
+        data=pdf_bytes,
+        file_name="Trebirth_Termatrac_Test_Report.pdf",
+        mime="application/pdf",
+    )
 
+show_instrumentation_panel(page_run)
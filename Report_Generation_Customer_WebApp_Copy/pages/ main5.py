@@ -1,5 +1,4 @@
 import streamlit as st
-from google.cloud import firestore
 import google.auth
 import pandas as pd
 from google.cloud.firestore import FieldFilter
@@ -10,6 +9,7 @@ import numpy as np
 import time
 import zipfile
 import os
+import sys
 import pytz
 import random
 from scipy import signal
@@ -18,19 +18,18 @@ from collections import defaultdict
 import matplotlib.dates as mdates
 import plotly.express as px
 import plotly.graph_objects as go
-from google.api_core.exceptions import ResourceExhausted, RetryError
-from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak, Table, TableStyle
+from reportlab.platypus import Paragraph, Spacer, PageBreak, Table, TableStyle
 from reportlab.pdfgen import canvas
 from reportlab.graphics.shapes import Line
-import tempfile
 import base64
-import plotly.io as pio
 from reportlab.lib.units import inch
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from trebirth.executor import get_executor
+from trebirth.firestore_client import get_client
+from trebirth.report_engine import report_styles, ReportImages, build_pdf
+from trebirth.timestamps import add_local_dates
 import kaleido
 
 #kaleido.get_chrome_sync()
@@ -49,7 +48,8 @@ st.write(f"Welcome, {company_name}!")
 #db = firestore.Client.from_service_account_json(cred_path)
 
 # Use Streamlit secrets instead of local JSON
-db = firestore.Client.from_service_account_info(st.secrets["firebase_admin"])
+db = get_client(st.secrets["firebase_admin"])
+executor = get_executor()
 query = db.collection("homescan2")
 
     # Your existing web app code starts here...
@@ -65,32 +65,6 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-def exponential_backoff(retries):
-    base_delay = 1
-    max_delay = 60
-    delay = base_delay * (2 ** retries) + random.uniform(0, 1)
-    return min(delay, max_delay)
-
-def get_firestore_data(query):
-    retries = 0
-    max_retries = 10
-    while retries < max_retries:
-        try:
-            results = query.stream()
-            return list(results)
-        except ResourceExhausted as e:
-            st.warning(f"Quota exceeded, retrying... (attempt {retries + 1})")
-            time.sleep(exponential_backoff(retries))
-            retries += 1
-        except RetryError as e:
-            st.warning(f"Retry error: {e}, retrying... (attempt {retries + 1})")
-            time.sleep(exponential_backoff(retries))
-            retries += 1
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
-            break
-    raise Exception("Max retries exceeded")
-
 #db = firestore.Client.from_service_account_json("Report_Generation_Customer_WebApp/testdata1-20ec5-firebase-adminsdk-an9r6-2ae6b81ad8.json")
 #query = db.collection('homescan2')
 
@@ -157,7 +131,7 @@ def plot_time_domain(preprocessed_scan, device_name, timestamp, scan_duration, s
     # Print additional metadata below the graph
   
 def fetch_data(company_name):
-    docs = query.stream()
+    docs = executor.stream(query, name='homescan2')
     #st.write(docs)
 
     locations = set()
@@ -179,12 +153,10 @@ def fetch_data(company_name):
                         city_to_areas[location] = set()
                     city_to_areas[location].add(Area)
 
-            # Convert timestamp to scan_date
-            timestamp_str = data.get("timestamp")
-            scan_date = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S").strftime('%Y-%m-%d') if timestamp_str else "Unknown Date"
-            data["scan_date"] = scan_date
             scans_data.append(data)
 
+    # Convert timestamps to scan_date for all scans in one pass
+    add_local_dates(scans_data)
     return sorted(locations), city_to_areas, scans_data
 
 locations, city_to_areas, scans_data = fetch_data(company_name)
@@ -254,38 +226,15 @@ else:
 
 
 def generate_pdf():
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmpfile:
-        pdf_path = tmpfile.name
-    
-    doc = SimpleDocTemplate(pdf_path, pagesize=A4)
-    styles = getSampleStyleSheet()
-
-    # Apply Times New Roman font
-    pdfmetrics.registerFont(TTFont('ARLRDBD', 'Report_Generation_Customer_WebApp/ARLRDBD.TTF'))
-    pdfmetrics.registerFont(TTFont('ARIAL', 'Report_Generation_Customer_WebApp/ARIAL.TTF'))
-    styles["Heading1"].fontName = 'ARLRDBD'
-    styles["Normal"].fontName = 'ARIAL'
-    
-    heading_style_centered = ParagraphStyle(
-        "HeadingStyleCentered", parent=styles["Heading1"], fontSize=20, textColor=colors.darkblue,
-        alignment=1, spaceAfter=10, underline=True, bold=True,
-    )
-
-    heading_style_left = ParagraphStyle(
-        "HeadingStyleLeft", parent=styles["Heading1"], fontSize=20, textColor=colors.darkblue,
-        alignment=0, spaceAfter=10, underline=True, bold=True,  # alignment=0 for left alignment
-    )
+    styles = report_styles()
+    heading_style_centered = styles["heading_centered"]
+    heading_style_left = styles["heading_left"]
+    heading_style_sub = styles["heading_sub"]
+    body_style = styles["body"]
+    bold_style = styles["bold"]
+    # One image store per report, so identical plots are embedded once
+    images = ReportImages()
 
-    heading_style_sub = ParagraphStyle(
-        "HeadingStyleLeft", parent=styles["Heading1"], fontSize=16, textColor=colors.black,
-        alignment=0, spaceAfter=10, underline=True, bold=True,  # alignment=0 for left alignment
-    )
-    
-    body_style = styles["Normal"]
-    body_style.fontSize = 12
-    bold_style = ParagraphStyle("BoldStyle", parent=body_style, fontSize=12, fontName="ARLRDBD")
-
-    
     elements = []
     elements.append(Paragraph("TREBIRTH TEST REPORT", heading_style_centered))
     #elements.append(Paragraph("SUPPLEMENT TO TIMBER PEST REPORT", heading_style_centered))
@@ -368,12 +317,8 @@ def generate_pdf():
                     # Generate the time domain plot
                     fig = plot_time_domain(processed_scan, device_name, timestamp, scan_duration)
                 
-                    # Save the plot as an image
-                    img_path = f"{tempfile.gettempdir()}/time_domain_plot.png"
-                    pio.write_image(fig, img_path, format="png")
-
-                    # Add the image to the PDF
-                    elements.append(Image(img_path, width=400, height=300))
+                    # Render the plot in memory and add it to the PDF
+                    elements.append(images.plot(fig, width=400, height=300))
                     elements.append(Spacer(1, 12))  # Space after image
 
                     # Add additional device info below the graph
@@ -409,18 +354,12 @@ def generate_pdf():
                     elements.append(table)
                     elements.append(Spacer(1, 20))
     
-    doc.build(elements)
-    # Remove temporary image file after generating PDF
-    os.remove(img_path)
-    return pdf_path
-    return
+    return build_pdf(elements)
 if st.button("Generate PDF Report"):
-    pdf_file = generate_pdf()
-    
-    with open(pdf_file, "rb") as file:
-        st.download_button(
-            label="Download PDF",
-            data=file,
-            file_name="Trebirth_Test_Report.pdf",
-            mime="application/pdf",
-        )
+    pdf_bytes = generate_pdf()
+    st.download_button(
+        label="Download PDF",
+        data=pdf_bytes,
+        file_name="Trebirth_Test_Report.pdf",
+        mime="application/pdf",
+    )
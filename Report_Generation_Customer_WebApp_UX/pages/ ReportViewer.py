@@ -1,30 +1,15 @@
 import streamlit as st
-from google.cloud import firestore
-import pandas as pd
 from datetime import datetime
-from dateutil import parser  # pip install python-dateutil for flexible date parsing
-import numpy as np
-import time
 import os
-import random
-import tempfile
-import plotly.io as pio
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import (
-    SimpleDocTemplate,
-    Paragraph,
-    Spacer,
-    Image,
-    PageBreak,
-    Table,
-    TableStyle,
-)
-from reportlab.lib.units import inch
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from google.api_core.exceptions import ResourceExhausted, RetryError
+import sys
+from streamlit_autorefresh import st_autorefresh
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from trebirth.firestore_client import get_client
+from trebirth.report_jobs import ReportJobQueue, QUEUED, RUNNING, DONE, FAILED
+from trebirth.queries import add_scan_dates
+from trebirth.instrumentation import tracked_cache
+from trebirth.sync import CompanyScans
 
 # Set browser path for kaleido (used for plotly image export)
 os.environ["BROWSER_PATH"] = "/usr/bin/chromium"
@@ -58,10 +43,9 @@ def logout():
             del st.session_state[key]
     st.rerun()
 
-@st.cache_resource
 def init_firestore():
     try:
-        return firestore.Client.from_service_account_info(st.secrets["firebase_admin"])
+        return get_client(st.secrets["firebase_admin"])
     except Exception:
         st.error("Firebase config not found in secrets, check configuration.")
         st.stop()
@@ -69,235 +53,28 @@ def init_firestore():
 
 db = init_firestore()
 
-def exponential_backoff(retries):
-    base_delay = 1
-    max_delay = 60
-    delay = base_delay * (2 ** retries) + random.uniform(0, 1)
-    return min(delay, max_delay)
-
-@st.cache_data
-def fetch_data(company_name):
-    if not db:
-        return [], {}, []
-    query = db.collection("pestcontrolindia")
-    docs = query.stream()
-
-    locations = set()
-    city_to_areas = {}
-    scans_data = []
-
-    for doc in docs:
-        data = doc.to_dict()
-        company = data.get("CompanyName", "").strip()
-
-        if company == company_name:
-            location = data.get("City", "").strip()
-            if location:
-                locations.add(location)
-                area = data.get("Area", "").strip()
-                if area:
-                    if location not in city_to_areas:
-                        city_to_areas[location] = set()
-                    city_to_areas[location].add(area)
-            # Parse timestamp string with flexible parser, fallback to "Unknown Date"
-            timestamp_str = data.get("timestamp")
-            scan_date = "Unknown Date"
-            if timestamp_str:
-                try:
-                    dt = parser.parse(str(timestamp_str))
-                    scan_date = dt.strftime("%Y-%m-%d")
-                except Exception:
-                    scan_date = "Unknown Date"
-            data["scan_date"] = scan_date
-            scans_data.append(data)
-    return sorted(locations), city_to_areas, scans_data
-
-def preprocess_radar_data(radar_raw):
-    # Process raw radar list into cleaned pandas DataFrame with no missing values
-    import pandas as pd
-    df_radar = pd.DataFrame(radar_raw, columns=["Radar"])
-    df_radar.dropna(inplace=True)
-    df_radar.fillna(df_radar.mean(), inplace=True)
-    return df_radar
-
-def plot_time_domain(preprocessed_scan, device_name, timestamp, scan_duration, sampling_rate=100):
-    # Create Plotly line plot of radar values over time with minimal axes
-    import plotly.graph_objects as go
-    fig = go.Figure()
-    time_seconds = np.arange(len(preprocessed_scan)) / sampling_rate
-    fig.add_trace(
-        go.Scatter(
-            x=time_seconds,
-            y=preprocessed_scan["Radar"],
-            mode="lines",
-            name=f"{device_name} - Unknown Timestamp",
-            line=dict(color="blue"),
-        )
-    )
-    fig.update_layout(
-        template="plotly_white",
-        xaxis_title=None,
-        yaxis_title=None,
-        xaxis=dict(showticklabels=False),
-        yaxis=dict(showticklabels=False),
-        legend_title="Scan",
-        font=dict(color="black"),
-        plot_bgcolor="rgba(0,0,0,0)",
-        paper_bgcolor="rgba(0,0,0,0)",
-        margin=dict(l=100, r=100, t=100, b=100),
-        shapes=[
-            dict(
-                type="rect",
-                x0=0,
-                y0=0,
-                x1=1,
-                y1=1,
-                xref="paper",
-                yref="paper",
-                line=dict(color="black", width=2),
-            )
-        ],
-    )
-    return fig
-
-def generate_pdf_for_apartment(apartment_scans, company_name):
-    import plotly.io as pio
-    import os
-    import tempfile
-    import time
-
-    pdf_path = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf").name
-    doc = SimpleDocTemplate(pdf_path, pagesize=A4)
-    styles = getSampleStyleSheet()
-
-    try:
-        pdfmetrics.registerFont(TTFont("ARLRDBD", "Report_Generation_Customer_WebApp/ARLRDBD.TTF"))
-        pdfmetrics.registerFont(TTFont("ARIAL", "Report_Generation_Customer_WebApp/ARIAL.TTF"))
-        styles["Heading1"].fontName = "ARLRDBD"
-        styles["Normal"].fontName = "ARIAL"
-    except:
-        pass
-
-    heading_style_centered = ParagraphStyle(
-        "HeadingStyleCentered", parent=styles["Heading1"], fontSize=20,
-        textColor=colors.darkblue, alignment=1, spaceAfter=10, underline=True, bold=True
-    )
-    heading_style_left = ParagraphStyle(
-        "HeadingStyleLeft", parent=styles["Heading1"], fontSize=20,
-        textColor=colors.darkblue, alignment=0, spaceAfter=10, underline=True, bold=True
-    )
-    heading_style_sub = ParagraphStyle(
-        "HeadingStyleLeft", parent=styles["Heading1"], fontSize=16,
-        textColor=colors.black, alignment=0, spaceAfter=10, underline=True, bold=True
-    )
-    body_style = styles["Normal"]
-    body_style.fontSize = 12
+# Number of worker processes rendering PDFs for all sessions of this server.
+REPORT_WORKERS = int(os.environ.get("TREBIRTH_REPORT_WORKERS", "2"))
 
-    elements = []
-    elements.append(Paragraph("TREBIRTH TEST REPORT", heading_style_centered))
-    elements.append(Spacer(1,16))
-    elements.append(Paragraph("This Trebirth test report is a supplementary report only and is only a record of the test findings.", body_style))
-    elements.append(Spacer(1,20))
-
-    if not apartment_scans:
-        elements.append(Paragraph("No data found.", body_style))
-    else:
-        first_scan = apartment_scans[0]
-        test_by = first_scan["CompanyName"]
-        report_loc = first_scan["City"]
-        apartment_name = first_scan["Apartment"]
-        report_date = first_scan["scan_date"]
-
-        data = [
-            ["Tests were carried out by:", test_by],
-            ["Date:", report_date],
-            ["Report for location at:", report_loc],
-            ["Name of the building/apartment:", apartment_name],
-        ]
-        table = Table(data, colWidths=[2.5*inch, 3.5*inch])
-        table.setStyle(
-            TableStyle([
-                ("ALIGN", (0,0), (-1,-1), "LEFT"),
-                ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
-                ("TEXTCOLOR", (0,0), (0,-1), colors.black),
-                ("TEXTCOLOR", (1,0), (1,-1), colors.darkblue),
-                ("BACKGROUND", (0,0), (-1,0), colors.lightgrey),
-                ("GRID", (0,0), (-1,-1), 0.5, colors.black)
-            ])
-        )
-        elements.append(table)
-        elements.append(PageBreak())
-
-        area_scans = {}
-        for scan in apartment_scans:
-            area = scan.get("Room", "Unknown Area")
-            if area not in area_scans:
-                area_scans[area] = []
-            area_scans[area].append(scan)
-
-        img_paths_to_delete = []
-        for i, (area, scans) in enumerate(area_scans.items(), start=1):
-            elements.append(Paragraph(f"{i} {area.upper()}", heading_style_left))
-            for j, scan in enumerate(scans, start=1):
-                elements.append(Paragraph(f"{i}.{j} Radar Scan", heading_style_sub))
-
-                radar_raw = scan.get("RadarRaw", [])
-                if radar_raw:
-                    processed_scan = preprocess_radar_data(radar_raw)
-                    device_name = scan.get("Devicename", "Unknown Device")
-                    timestamp = scan.get("timestamp", datetime.now())
-                    scan_duration = scan.get("ScanDuration", "Unknown")
-                    fig = plot_time_domain(processed_scan, device_name, timestamp, scan_duration)
-
-                    img_path = f"{tempfile.gettempdir()}/time_domain_plot_{i}_{j}.png"
-                    pio.write_image(fig, img_path, format="png")
-                    time.sleep(0.2)
-                    if os.path.isfile(img_path):
-                        elements.append(Image(img_path, width=400, height=300))
-                        img_paths_to_delete.append(img_path)
-                    else:
-                        st.error(f"Image file not found: {img_path}")
-
-                    elements.append(Spacer(1, 12))
-                    elements.append(Paragraph(f"Device Name: {device_name}", body_style))
-                    elements.append(Spacer(1, 3))
-                    try:
-                        ts_obj = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-                    except Exception:
-                        ts_obj = timestamp
-                    elements.append(Paragraph(f"Timestamp: {ts_obj}", body_style))
-                    elements.append(Spacer(1, 3))
-                    elements.append(Paragraph(f"Scan Duration: {scan_duration}", body_style))
-                    elements.append(Spacer(1, 12))
-
-                    data = [
-                        ["Scan Location:", scan.get("Room", "N/A")],
-                        ["Device was:", scan.get("Positioned", "N/A")],
-                        ["Damage Visible:", scan.get("DamageVisible", "N/A")],
-                    ]
-                    table = Table(data, colWidths=[2.5*inch, 3.5*inch])
-                    table.setStyle(
-                        TableStyle([
-                            ("ALIGN", (0,0), (0,-1), "LEFT"),
-                            ("ALIGN", (1,0), (-1,-1), "LEFT"),
-                            ("BOTTOMPADDING", (0,0), (-1,-1), 5),
-                        ])
-                    )
-                    elements.append(table)
-                    elements.append(Spacer(1,20))
-        doc.build(elements)
-        for path in img_paths_to_delete:
-            try:
-                os.remove(path)
-            except Exception:
-                pass
-    return pdf_path
+@st.cache_resource
+def report_queue():
+    return ReportJobQueue(max_workers=REPORT_WORKERS, credentials_info=st.secrets["firebase_admin"])
+
+@tracked_cache('company_scans', st.cache_resource)
+def company_scans(company_name):
+    # One store per company, shared by all of its sessions. CompanyName is
+    # filtered by Firestore and only metadata fields are downloaded; RadarRaw is
+    # loaded per apartment when a PDF is generated.
+    scans = CompanyScans(db, company_name, prepare=add_scan_dates)
+    if db:
+        scans.sync()
+    return scans
 
 def refresh_data():
     """Callback function to refresh data"""
     company_name = st.session_state["company"]
-    fetch_data.clear()
-    st.session_state.locations, st.session_state.city_to_areas, st.session_state.scans_data = fetch_data(company_name)
+    changed = company_scans(company_name).sync()
+    st.toast(f"{changed} scan(s) added, updated or removed." if changed else "Already up to date.")
     
 def main():
     company_name = st.session_state["company"]
@@ -311,8 +88,7 @@ def main():
             margin-bottom: 2rem;
         }
         </style>""", unsafe_allow_html=True)
-    if 'locations' not in st.session_state:
-        st.session_state.locations, st.session_state.city_to_areas, st.session_state.scans_data = fetch_data(company_name)
+    scan_index = company_scans(company_name)
     with st.sidebar:
         
         st.title(f"Welcome, {company_name}!")
@@ -320,19 +96,9 @@ def main():
             logout()
         st.button("Refresh DB", type = "secondary", on_click=refresh_data)
         st.markdown("---")
-        locations, city_to_areas, scans_data = fetch_data(company_name)
-        selected_location = st.selectbox("Select Report Location:", st.session_state.locations, key="selected_location")
-        filtered_areas = st.session_state.city_to_areas.get(selected_location, [])
-        selected_area = st.selectbox("Select Report Area:", sorted(filtered_areas), key="selected_area")
-        scan_months = set()
-        for scan in st.session_state.scans_data:
-            if (scan.get("City", "").strip() == selected_location and scan.get("Area", "").strip() == selected_area):
-                try:
-                    scan_date_obj = datetime.strptime(scan.get("scan_date", "1970-01-01"), "%Y-%m-%d")
-                    scan_months.add(scan_date_obj.strftime("%Y-%m"))
-                except Exception:
-                    continue
-        scan_months = sorted(list(scan_months))
+        selected_location = st.selectbox("Select Report Location:", scan_index.cities(), key="selected_location")
+        selected_area = st.selectbox("Select Report Area:", scan_index.areas(selected_location), key="selected_area")
+        scan_months = scan_index.months(selected_location, selected_area)
         selected_month = st.selectbox("Select scan month:", scan_months, key="selected_month")
     if selected_month:
         month_dt = datetime.strptime(selected_month, "%Y-%m")
@@ -340,24 +106,17 @@ def main():
     else:
         pretty_month_label = ""
     st.markdown(f'<h1 class="main-header">Trebirth Scan Report Viewer</h1>', unsafe_allow_html=True)
+    queue = report_queue()
+    if "report_jobs" not in st.session_state:
+        st.session_state.report_jobs = {}
+    # Finished PDFs, kept until their download button is clicked
+    if "report_pdfs" not in st.session_state:
+        st.session_state.report_pdfs = {}
     if selected_location and selected_area and selected_month:
-        final_scans = [
-            scan
-            for scan in scans_data
-            if scan.get("City", "").strip() == selected_location
-            and scan.get("Area", "").strip() == selected_area
-            and scan.get("scan_date", "1970-01-01").startswith(selected_month)
-            and scan.get("CompanyName", "").strip() == company_name
-        ]
-        if final_scans:
+        apartments = scan_index.apartments(selected_location, selected_area, selected_month)
+        if apartments:
             st.subheader(f"All Scans for {selected_area} in {pretty_month_label}")
             st.markdown("<div style='height:25px;'></div>", unsafe_allow_html=True)
-            apartments = {}
-            for scan in final_scans:
-                apt = scan.get("Apartment", "N/A")
-                if apt not in apartments:
-                    apartments[apt] = []
-                apartments[apt].append(scan)
             col1, col2, col3, col4 = st.columns([3, 2, 2, 2])
             with col1: st.write("**Apartment**")
             with col2: st.write("**Date of Scan**")
@@ -371,22 +130,42 @@ def main():
                 with col2: st.write(first_scan.get("scan_date", "Unknown Date"))
                 with col3: st.write(first_scan.get("Incharge", "N/A"))
                 with col4:
-                    if st.button("Download PDF", key=f"pdf_{apartment}_{selected_month}_{selected_area}"):
-                        with st.spinner(f"Generating PDF for {apartment}..."):
-                            try:
-                                pdf_file = generate_pdf_for_apartment(scans, company_name)
-                                with open(pdf_file, "rb") as file:
-                                    st.download_button(
-                                        label=f"Download {apartment} Report",
-                                        data=file,
-                                        file_name=f"Trebirth_Report_{apartment}_{selected_month}.pdf",
-                                        mime="application/pdf",
-                                        key=f"download_{apartment}_{selected_month}_{selected_area}",
-                                    )
-                                os.remove(pdf_file)
-                            except Exception as e:
-                                st.error(f"Error generating PDF: {str(e)}")
+                    job_key = f"{apartment}_{selected_month}_{selected_area}"
+                    job_id = st.session_state.report_jobs.get(job_key)
+                    status = queue.status(job_id) if job_id else None
+                    if status == DONE:
+                        # The PDF moves into the session and the job leaves the queue
+                        st.session_state.report_pdfs[job_key] = queue.take(job_id)
+                        del st.session_state.report_jobs[job_key]
+                        status = None
+                    if job_key in st.session_state.report_pdfs:
+                        # Clicking it clears the PDF, so the next click generates a fresh one
+                        st.download_button(
+                            label=f"Download {apartment} Report",
+                            data=st.session_state.report_pdfs[job_key],
+                            file_name=f"Trebirth_Report_{apartment}_{selected_month}.pdf",
+                            mime="application/pdf",
+                            key=f"download_{job_key}",
+                            on_click=st.session_state.report_pdfs.pop,
+                            args=(job_key, None),
+                        )
+                    elif status is None:
+                        if st.button("Download PDF", key=f"pdf_{job_key}"):
+                            st.session_state.report_jobs[job_key] = queue.submit(company_name, scans, selected_month, apartment)
+                            st.rerun()
+                    elif status == FAILED:
+                        try:
+                            queue.result(job_id)
+                        except Exception as e:
+                            st.error(f"Error generating PDF: {str(e)}")
+                        queue.pop(job_id)
+                        del st.session_state.report_jobs[job_key]
+                    else:
+                        st.write("Queued..." if status == QUEUED else f"Generating PDF for {apartment}...")
                 st.markdown("---")
+            # Poll while any of this session's reports are still rendering.
+            if any(queue.status(job_id) in (QUEUED, RUNNING) for job_id in st.session_state.report_jobs.values()):
+                st_autorefresh(interval=2000, key="report_jobs_poll")
         else:
             st.warning("No scans available for the selected criteria.")
     else:
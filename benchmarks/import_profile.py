@@ -0,0 +1,149 @@
+"""Profile the import cost of each Streamlit entry point with -X importtime.
+
+    python benchmarks/import_profile.py --repeat 5
+    python benchmarks/import_profile.py --compare benchmarks/results/import_profile_<old>.json
+
+Only the module-level import statements of each page are run, in a fresh
+interpreter, so the numbers are the cold-start cost a page pays before its
+first line of UI code. Modules behind trebirth.lazy.lazy_import are not
+counted until something uses them. Results are written as JSON to
+benchmarks/results/ (or --out).
+"""
+import argparse
+import ast
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+ENTRY_POINTS = [
+    "Admin_WebApp/main2.py",
+    "Admin_WebApp/farm_analytics.py",
+    "Data_Analytics/data_analytics.py",
+    "Report_Generation_Admin_WebApp/main4.py",
+    "Report_Generation_Admin_WebApp/pages/main5.py",
+    "Report_Generation_Customer_WebApp/LogIn.py",
+    "Report_Generation_Customer_WebApp/pages/ ReportViewer.py",
+    "Report_Generation_Customer_WebApp_Copy/main4.py",
+    "Report_Generation_Customer_WebApp_Copy/pages/ main5.py",
+    "Report_Generation_Customer_WebApp_UX/LogIn.py",
+    "Report_Generation_Customer_WebApp_UX/pages/ ReportViewer.py",
+]
+
+
+def import_script(path):
+    # The page's top-level imports, each guarded so a missing optional package
+    # is reported instead of aborting the profile.
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    app_dir = os.path.dirname(path)
+    if os.path.basename(app_dir) == "pages":
+        app_dir = os.path.dirname(app_dir)
+    lines = [
+        "import sys, time, json",
+        f"sys.path[:0] = [{ROOT!r}, {app_dir!r}]",
+        "missing = []",
+        "start = time.perf_counter()",
+    ]
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            lines += ["try:", f"    {ast.unparse(node)}", "except ImportError as e:", "    missing.append(e.name)"]
+    lines.append("print(json.dumps({'seconds': time.perf_counter() - start, 'missing': missing}))")
+    return "\n".join(lines)
+
+
+def parse_importtime(stderr):
+    # "import time: self [us] | cumulative | imported package"; top-level
+    # imports are the ones whose name is not indented.
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            # Nested imports are indented two spaces per level.
+            "top_level": len(name) - len(name.lstrip()) <= 1,
+        })
+    return modules
+
+
+def profile_entry(path, repeat, top):
+    script = import_script(os.path.join(ROOT, path))
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", script],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            return {"entry_point": path, "error": proc.stderr.strip().splitlines()[-1]}
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        if best is None or result["seconds"] < best["seconds"]:
+            best = dict(result, modules=parse_importtime(proc.stderr))
+    modules = best["modules"]
+    heaviest = sorted((m for m in modules if m["top_level"]), key=lambda m: m["cumulative_us"], reverse=True)
+    return {
+        "entry_point": path,
+        "seconds": round(best["seconds"], 4),
+        "modules_imported": len(modules),
+        "missing": best["missing"],
+        "heaviest": [{"module": m["module"].strip(), "cumulative_ms": round(m["cumulative_us"] / 1000, 1)} for m in heaviest[:top]],
+    }
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per entry point; the fastest is kept")
+    arg_parser.add_argument("--top", type=int, default=10, help="heaviest top-level imports to list")
+    arg_parser.add_argument("--entry", action="append", dest="entries", help="only profile this entry point (repeatable)")
+    arg_parser.add_argument("--compare", help="earlier result file to print deltas against")
+    arg_parser.add_argument("--out", help="result file (default: benchmarks/results/import_profile_<timestamp>.json)")
+    args = arg_parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {r["entry_point"]: r for r in json.load(f)["runs"] if "seconds" in r}
+
+    runs = []
+    for path in args.entries or ENTRY_POINTS:
+        run = profile_entry(path, args.repeat, args.top)
+        runs.append(run)
+        if "error" in run:
+            print(f"{path}: failed ({run['error']})")
+            continue
+        line = f"{path}: {run['seconds'] * 1000:.0f} ms, {run['modules_imported']} modules"
+        if path in baseline:
+            before = baseline[path]["seconds"]
+            line += f" (was {before * 1000:.0f} ms, {(run['seconds'] - before) / before:+.0%})"
+        if run["missing"]:
+            line += f", not installed: {', '.join(sorted(set(run['missing'])))}"
+        print(line)
+        for module in run["heaviest"][:3]:
+            print(f"    {module['module']}: {module['cumulative_ms']} ms")
+
+    result = {
+        "benchmark": "import_profile",
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+        "runs": runs,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"import_profile_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
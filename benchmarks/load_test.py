@@ -0,0 +1,286 @@
+"""Drive N concurrent simulated sessions through the Streamlit apps.
+
+    python benchmarks/load_test.py --sessions 16
+    python benchmarks/load_test.py --scenario data_analytics --sessions 4 --iterations 10
+
+Each session is a streamlit.testing AppTest that clicks through a scenario
+(log in, pick City/Area/Month, request a PDF; or query trees and move the
+filter sliders) against the synthetic in-process Firestore
+(TREBIRTH_FAKE_FIRESTORE), so runs are offline and repeatable.
+
+AppTest swaps process-wide Streamlit state (runtime, secrets, config) on
+every run, so sessions cannot share one interpreter. Each session runs in its
+own process instead, all released together by a barrier; caches are therefore
+per session, much like a cold server. Reported per scenario: p50/p95/p99
+rerun latency overall and per step, CPU seconds (including report worker
+processes) and peak RSS. Results are written as JSON to benchmarks/results/
+(or --out).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+VIEWER_LOGIN = os.path.join(ROOT, "Report_Generation_Customer_WebApp", "LogIn.py")
+DATA_ANALYTICS = os.path.join(ROOT, "Data_Analytics", "data_analytics.py")
+
+# Company logins the synthetic pestcontrolindia collection has scans for.
+CUSTOMER_LOGINS = {"PCI": "P2025$$", "Trebirth": "T2025$$"}
+
+_barrier = None
+
+
+class SessionFailed(Exception):
+    pass
+
+
+class Session:
+    """One simulated user: an AppTest plus the timing of every rerun."""
+
+    def __init__(self, app_test, timeout):
+        self.at = app_test
+        self.timeout = timeout
+        self.steps = []
+
+    def run(self, step):
+        start = time.perf_counter()
+        error = None
+        try:
+            self.at.run(timeout=self.timeout)
+            if self.at.exception:
+                error = self.at.exception[0].value
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        self.steps.append({"step": step, "seconds": time.perf_counter() - start, "error": error})
+        if error:
+            raise SessionFailed(error)
+
+
+def by_label(elements, label):
+    for element in elements:
+        if element.label == label:
+            return element
+    raise SessionFailed(f"no widget labelled {label!r}")
+
+
+def viewer_session(session, rng, iterations, pdf_timeout):
+    from streamlit.testing.v1 import AppTest
+
+    company = list(CUSTOMER_LOGINS)[rng.integers(len(CUSTOMER_LOGINS))]
+    session.at = at = AppTest.from_file(VIEWER_LOGIN, default_timeout=session.timeout)
+    # The report queue hands these to its workers; the fake client ignores them.
+    at.secrets["firebase_admin"] = {"project_id": "synthetic"}
+    session.run("open_login")
+    by_label(at.text_input, "Company Name").input(company)
+    by_label(at.text_input, "Password").input(CUSTOMER_LOGINS[company])
+    by_label(at.button, "Login").click()
+    # Logging in switches to the viewer page, which loads the company's scans.
+    session.run("login")
+
+    for _ in range(iterations):
+        for key, step in (("selected_location", "select_city"), ("selected_area", "select_area"),
+                          ("selected_month", "select_month")):
+            box = at.selectbox(key=key)
+            if box.options:
+                box.select(box.options[rng.integers(len(box.options))])
+            session.run(step)
+
+    buttons = [b for b in at.button if b.key and b.key.startswith("pdf_")]
+    if not buttons:
+        return None
+    buttons[rng.integers(len(buttons))].click()
+    session.run("request_pdf")
+    # Poll like the page's autorefresh does until the download button appears.
+    requested = time.perf_counter()
+    while time.perf_counter() - requested < pdf_timeout:
+        if any(d.key and d.key.startswith("download_") for d in at.get("download_button")):
+            return time.perf_counter() - requested
+        if at.error:
+            raise SessionFailed(at.error[0].value)
+        time.sleep(0.5)
+        session.run("poll_pdf")
+    raise SessionFailed(f"PDF not ready after {pdf_timeout}s")
+
+
+def data_analytics_session(session, rng, iterations, pdf_timeout):
+    from streamlit.testing.v1 import AppTest
+    from trebirth.synthetic import PRESETS
+
+    sizes = PRESETS[os.environ.get("TREBIRTH_FAKE_FIRESTORE", "small").partition(":")[0]]
+    session.at = at = AppTest.from_file(DATA_ANALYTICS, default_timeout=session.timeout)
+    session.run("open")
+    by_label(at.text_input, "Enter Row number").input(str(rng.integers(1, sizes["rows"] + 1)))
+    by_label(at.text_input, "Enter Tree number").input(str(rng.integers(1, sizes["trees_per_row"] + 1)))
+    session.run("pick_tree")
+    for _ in range(iterations):
+        by_label(at.slider, "Select Frequency (Hz)").set_value(int(rng.integers(1, 51)))
+        session.run("move_slider")
+    by_label(at.selectbox, "Select Filter Type").select("Band Pass Filter (BPF)")
+    session.run("band_pass")
+    for _ in range(iterations):
+        low = int(rng.integers(1, 50))
+        by_label(at.slider, "Select Frequency Range (Hz)").set_value((low, int(rng.integers(low + 1, 51))))
+        session.run("move_range")
+    return None
+
+
+SCENARIOS = {
+    "viewer": viewer_session,
+    "data_analytics": data_analytics_session,
+}
+
+
+def _init_worker(barrier, fake):
+    global _barrier
+    _barrier = barrier
+    os.environ["TREBIRTH_FAKE_FIRESTORE"] = fake
+    # Keep per-rerun deprecation warnings out of the report.
+    os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+    os.chdir(ROOT)
+    # The pages import their sibling modules the way `streamlit run` allows.
+    sys.path[:0] = [ROOT, os.path.dirname(DATA_ANALYTICS)]
+
+
+def _cpu_seconds():
+    usage = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return sum(u.ru_utime + u.ru_stime for u in usage)
+
+
+def _max_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_session(scenario, index, seed, iterations, timeout, pdf_timeout):
+    rng = np.random.default_rng(seed + index)
+    session = Session(None, timeout)
+    _barrier.wait()
+    cpu_start = _cpu_seconds()
+    wall_start = time.perf_counter()
+    error = pdf_wait = None
+    try:
+        pdf_wait = SCENARIOS[scenario](session, rng, iterations, pdf_timeout)
+    except SessionFailed as e:
+        error = str(e)
+    # Stop the report workers the page started: they would outlive the session,
+    # and their CPU time only shows up in RUSAGE_CHILDREN once they are reaped.
+    for child in multiprocessing.active_children():
+        child.terminate()
+        child.join()
+    return {
+        "session": index,
+        "steps": session.steps,
+        "error": error,
+        "pdf_wait": pdf_wait,
+        "wall_seconds": time.perf_counter() - wall_start,
+        "cpu_seconds": _cpu_seconds() - cpu_start,
+        "max_rss_mb": round(_max_rss_mb(), 1),
+    }
+
+
+def percentiles(seconds):
+    if not seconds:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    p50, p95, p99 = np.percentile(np.asarray(seconds) * 1000, [50, 95, 99])
+    return {"p50_ms": round(p50, 1), "p95_ms": round(p95, 1), "p99_ms": round(p99, 1)}
+
+
+def summarize(scenario, sessions, wall):
+    reruns = [step for s in sessions for step in s["steps"]]
+    per_step = {}
+    for step in reruns:
+        per_step.setdefault(step["step"], []).append(step["seconds"])
+    pdf_waits = [s["pdf_wait"] for s in sessions if s["pdf_wait"] is not None]
+    cpu = sum(s["cpu_seconds"] for s in sessions)
+    return {
+        "scenario": scenario,
+        "sessions": len(sessions),
+        "failed_sessions": sum(s["error"] is not None for s in sessions),
+        "errors": sorted({s["error"] for s in sessions if s["error"]}),
+        "reruns": len(reruns),
+        "wall_seconds": round(wall, 3),
+        "reruns_per_second": round(len(reruns) / wall, 2) if wall else None,
+        **percentiles([step["seconds"] for step in reruns]),
+        "steps": {name: dict(percentiles(seconds), count=len(seconds)) for name, seconds in per_step.items()},
+        "pdf_wait": percentiles(pdf_waits) if pdf_waits else None,
+        "cpu_seconds": round(cpu, 3),
+        "cpu_ms_per_rerun": round(cpu / len(reruns) * 1000, 1) if reruns else None,
+        "max_rss_mb": max(s["max_rss_mb"] for s in sessions),
+        "total_rss_mb": round(sum(s["max_rss_mb"] for s in sessions), 1),
+    }
+
+
+def run_scenario(scenario, args):
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(args.sessions)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.sessions, mp_context=ctx, initializer=_init_worker,
+                             initargs=(barrier, args.preset)) as pool:
+        futures = [
+            pool.submit(run_session, scenario, i, args.seed, args.iterations, args.timeout, args.pdf_timeout)
+            for i in range(args.sessions)
+        ]
+        sessions = [future.result() for future in futures]
+    return summarize(scenario, sessions, time.perf_counter() - start), sessions
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--scenario", action="append", dest="scenarios", choices=sorted(SCENARIOS),
+                            help="scenario to run (repeatable; default: all)")
+    arg_parser.add_argument("--sessions", type=int, default=8, help="concurrent sessions per scenario")
+    arg_parser.add_argument("--iterations", type=int, default=3, help="selection/slider rounds per session")
+    arg_parser.add_argument("--preset", default="small", help="synthetic dataset, TREBIRTH_FAKE_FIRESTORE syntax")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per rerun")
+    arg_parser.add_argument("--pdf-timeout", type=float, default=120, help="seconds to wait for a requested PDF")
+    arg_parser.add_argument("--out", help="result file (default: benchmarks/results/load_test_<timestamp>.json)")
+    args = arg_parser.parse_args(argv)
+
+    results = []
+    for scenario in args.scenarios or list(SCENARIOS):
+        summary, sessions = run_scenario(scenario, args)
+        results.append(dict(summary, session_runs=sessions))
+        print(f"{scenario}: {summary['sessions']} sessions, {summary['reruns']} reruns, "
+              f"p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, p99 {summary['p99_ms']} ms, "
+              f"CPU {summary['cpu_seconds']} s ({summary['cpu_ms_per_rerun']} ms/rerun), "
+              f"peak RSS {summary['max_rss_mb']} MB/session")
+        for name, step in summary["steps"].items():
+            print(f"    {name}: p50 {step['p50_ms']} ms, p95 {step['p95_ms']} ms (x{step['count']})")
+        if summary["pdf_wait"]:
+            print(f"    PDF ready after: p50 {summary['pdf_wait']['p50_ms']} ms, p95 {summary['pdf_wait']['p95_ms']} ms")
+        if summary["failed_sessions"]:
+            first_lines = sorted({e.strip().splitlines()[0] for e in summary["errors"]})
+            print(f"    {summary['failed_sessions']} sessions failed: {'; '.join(first_lines)}")
+
+    result = {
+        "benchmark": "load_test",
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "preset": args.preset,
+        "sessions": args.sessions,
+        "iterations": args.iterations,
+        "scenarios": results,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"load_test_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
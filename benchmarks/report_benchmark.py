@@ -0,0 +1,110 @@
+"""Time each stage of the apartment report path on synthetic apartments.
+
+    python benchmarks/report_benchmark.py --sizes 10 50 100 250 500
+
+Stages are timed by wrapping the report engine's own functions, so the
+benchmark exercises exactly the code the viewer and the batch CLI run:
+preprocess_radar_data, plot_time_domain, PNG export and the ReportLab build.
+Results are written as JSON to benchmarks/results/ (or --out).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from trebirth import report_engine
+from trebirth.synthetic import synthetic_apartment
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+class StageTimer:
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self._patched = []
+
+    def wrap(self, owner, attr, stage):
+        original = getattr(owner, attr)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.seconds[stage] += time.perf_counter() - start
+                self.calls[stage] += 1
+
+        setattr(owner, attr, timed)
+        self._patched.append((owner, attr, original))
+
+    def restore(self):
+        for owner, attr, original in reversed(self._patched):
+            setattr(owner, attr, original)
+        self._patched = []
+
+
+def run_once(scans, quality):
+    timer = StageTimer()
+    timer.wrap(report_engine, "preprocess_radar_data", "preprocess_radar_data")
+    timer.wrap(report_engine, "plot_time_domain", "plot_time_domain")
+    timer.wrap(report_engine.ReportImages, "render_png", "image_export")
+    timer.wrap(report_engine, "build_pdf", "doc_build")
+    stats = {}
+    start = time.perf_counter()
+    try:
+        report_engine.generate_pdf_for_apartment(scans, scans[0]["CompanyName"], quality=quality, stats=stats)
+    finally:
+        timer.restore()
+    return {
+        "total_seconds": round(time.perf_counter() - start, 4),
+        "stages": {stage: round(seconds, 4) for stage, seconds in timer.seconds.items()},
+        "calls": dict(timer.calls),
+        "pages": stats["pages"],
+        "bytes": stats["bytes"],
+    }
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 250, 500], help="scans per apartment")
+    arg_parser.add_argument("--samples", type=int, default=3000, help="RadarRaw samples per scan (100 Hz)")
+    arg_parser.add_argument("--repeat", type=int, default=1, help="runs per size; the fastest is kept")
+    arg_parser.add_argument("--quality", choices=["draft", "final"], default="final")
+    arg_parser.add_argument("--out", help="result file (default: benchmarks/results/report_<timestamp>.json)")
+    args = arg_parser.parse_args(argv)
+
+    # Fonts and styles are per-process setup, not part of any report.
+    report_engine.report_styles()
+
+    runs = []
+    for size in args.sizes:
+        scans = synthetic_apartment(size, samples=args.samples, seed=size)
+        best = min((run_once(scans, args.quality) for _ in range(args.repeat)), key=lambda r: r["total_seconds"])
+        best["scans"] = size
+        runs.append(best)
+        stages = ", ".join(f"{k} {v:.2f}s" for k, v in best["stages"].items())
+        print(f"{size:4d} scans: {best['total_seconds']:.2f}s ({stages}), {best['pages']} pages, {best['bytes'] / 1e6:.2f} MB")
+
+    result = {
+        "benchmark": "report_generation",
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "samples_per_scan": args.samples,
+        "quality": args.quality,
+        "runs": runs,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"report_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Throughput of the overlap-save streaming filter, in samples per second.
+
+    python benchmarks/streaming_filter_benchmark.py --seconds 3600 --chunks 100 1000 10000
+
+A synthetic radar recording of --seconds at 100 Hz is fed through
+Data_Analytics/streaming.OverlapSaveFilter in chunks of each size, for the
+LPF and HPF coefficient sets in Filters.py. Every run is checked against
+scipy.signal.lfilter over the whole recording, which is also timed as the
+batch baseline. The page's per-sample process() loop is timed on the first
+--process-samples samples only, since it is orders of magnitude slower.
+Results are written as JSON to benchmarks/results/ (or --out).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+from scipy.signal import lfilter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "Data_Analytics")]
+import Filters
+from streaming import OverlapSaveFilter
+from trebirth.synthetic import SAMPLING_RATE, radar_signal
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+COEFFICIENTS = ["coefLPF50Hz", "coefLPF5Hz", "coefHPF5Hz"]
+
+
+def process(coef, in_signal):
+    # Data_Analytics/data_analytics.py process(), copied so the page is not imported.
+    FILTERTAPS = len(coef)
+    values = np.zeros(FILTERTAPS)
+    out_signal = []
+    k = 0
+    for in_value in in_signal:
+        values[k] = in_value
+        out_signal.append(np.dot(coef, np.roll(values, k)))
+        k = (k + 1) % FILTERTAPS
+    return out_signal
+
+
+def best_of(repeat, function):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None or seconds < best else best
+    return best, result
+
+
+def stream(coef, signal, chunk, block_size):
+    fir = OverlapSaveFilter(coef, block_size)
+    return np.concatenate([fir.process(signal[..., i:i + chunk]) for i in range(0, signal.shape[-1], chunk)], axis=-1)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--seconds", type=int, default=3600, help="length of the synthetic recording")
+    arg_parser.add_argument("--channels", type=int, default=1, help="channels filtered together (e.g. 4 for radar + Ax/Ay/Az)")
+    arg_parser.add_argument("--chunks", type=int, nargs="+", default=[100, 1000, 10000, 100000], help="samples per chunk")
+    arg_parser.add_argument("--block-size", type=int, help="new samples per FFT (default: the filter length)")
+    arg_parser.add_argument("--process-samples", type=int, default=3000, help="samples to time the process() loop on")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the fastest is kept")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--out", help="result file (default: benchmarks/results/streaming_filter_<timestamp>.json)")
+    args = arg_parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    samples = args.seconds * SAMPLING_RATE
+    signal = np.stack([radar_signal(rng, samples, infested=True) for _ in range(args.channels)])
+    if args.channels == 1:
+        signal = signal[0]
+    total = signal.size
+
+    runs = []
+    for name in COEFFICIENTS:
+        coef = np.asarray(getattr(Filters, name))
+        seconds, expected = best_of(args.repeat, lambda: lfilter(coef, 1, signal, axis=-1))
+        print(f"{name} ({len(coef)} taps): lfilter {total / seconds / 1e6:.2f} M samples/s")
+        runs.append({"coefficients": name, "taps": len(coef), "method": "lfilter", "samples": total,
+                     "seconds": round(seconds, 4), "samples_per_second": round(total / seconds)})
+
+        for chunk in args.chunks:
+            seconds, out = best_of(args.repeat, lambda: stream(coef, signal, chunk, args.block_size))
+            error = float(np.abs(out - expected).max())
+            print(f"    chunk {chunk}: {total / seconds / 1e6:.2f} M samples/s, max |error| vs lfilter {error:.1e}")
+            runs.append({"coefficients": name, "taps": len(coef), "method": "overlap_save", "chunk": chunk,
+                         "fft_size": OverlapSaveFilter(coef, args.block_size).nfft, "samples": total,
+                         "seconds": round(seconds, 4), "samples_per_second": round(total / seconds),
+                         "max_abs_error": error})
+
+        head = np.atleast_2d(signal)[0, :args.process_samples]
+        seconds, _ = best_of(1, lambda: process(coef, head))
+        print(f"    process() loop: {len(head) / seconds / 1e3:.1f} k samples/s")
+        runs.append({"coefficients": name, "taps": len(coef), "method": "process", "samples": len(head),
+                     "seconds": round(seconds, 4), "samples_per_second": round(len(head) / seconds)})
+
+    result = {
+        "benchmark": "streaming_filter",
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "numpy": np.__version__,
+        "recording_seconds": args.seconds,
+        "channels": args.channels,
+        "runs": runs,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"streaming_filter_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
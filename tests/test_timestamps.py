@@ -0,0 +1,15 @@
+import datetime
+
+from trebirth.timestamps import normalize_timestamps
+
+
+def test_ambiguous_dates_are_read_month_first():
+    # The same reading dateutil.parser.parse gives, which the apps used before.
+    dates = normalize_timestamps(["01/02/2025", "01-02-2025 10:00:00", "13/02/2025"])["local_date"]
+    assert list(dates) == [datetime.date(2025, 1, 2), datetime.date(2025, 1, 2), datetime.date(2025, 2, 13)]
+
+
+def test_year_first_strings_and_datetimes():
+    aware = datetime.datetime(2025, 3, 31, 20, 0, tzinfo=datetime.timezone.utc)
+    dates = normalize_timestamps(["2025-03-01 10:00:00", "2025/03/02", aware, None])["local_date"]
+    assert list(dates) == [datetime.date(2025, 3, 1), datetime.date(2025, 3, 2), datetime.date(2025, 4, 1), None]
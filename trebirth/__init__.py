@@ -0,0 +1 @@
+# Shared helpers for the Trebirth Streamlit apps.
@@ -0,0 +1,164 @@
+"""Pre-build apartment PDF reports for every company without Streamlit.
+
+    python -m trebirth.batch_reports --credentials key.json --out reports --workers 4
+
+One report is produced per (company, city, area, month, apartment), with the same
+layout the customer ReportViewer downloads. A report whose scans have not
+changed since the last run is skipped. manifest.json in the output directory
+records each report's fingerprint, size, page count and per-page render time.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from trebirth.firestore_client import get_client
+from trebirth.navigation import ScanIndex
+from trebirth.queries import add_scan_dates, stream_company_scans
+from trebirth.report_jobs import render_apartment_report
+
+MANIFEST_NAME = "manifest.json"
+
+
+def safe_name(value):
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", str(value)).strip("_") or "unknown"
+
+
+def report_fingerprint(scans):
+    # Changes when a scan is added, removed or any of its metadata changes.
+    rows = sorted(
+        json.dumps({k: v for k, v in scan.items() if k != "RadarRaw"}, sort_keys=True, default=str)
+        for scan in scans
+    )
+    return hashlib.sha1("\n".join(rows).encode("utf-8")).hexdigest()
+
+
+def _company_scans(db, companies):
+    # Only the named companies' scans when there are any, filtered by Firestore.
+    if not companies:
+        yield from stream_company_scans(db, None)
+        return
+    for company in sorted({company.strip() for company in companies}):
+        yield from stream_company_scans(db, company)
+
+
+def enumerate_reports(db, companies=None):
+    indexes = {}
+    for data in add_scan_dates(_company_scans(db, companies)):
+        company = data.get("CompanyName", "").strip()
+        if company:
+            indexes.setdefault(company, ScanIndex()).add(data)
+
+    for company, index in sorted(indexes.items()):
+        for city in index.cities():
+            for area in index.areas(city):
+                for month in index.months(city, area):
+                    for apartment, scans in index.apartments(city, area, month).items():
+                        yield (company, city, area, month, apartment), scans
+
+
+def report_path(out_dir, key):
+    company, city, area, month, apartment = key
+    return os.path.join(
+        out_dir, safe_name(company), safe_name(city), safe_name(area), month,
+        f"Trebirth_Report_{safe_name(apartment)}_{month}.pdf",
+    )
+
+
+def render_to_file(credentials_info, scans, company, path, quality="final"):
+    # Worker entry point: render one report and write it, returning the timings.
+    start = time.perf_counter()
+    stats = {}
+    pdf_bytes = render_apartment_report(credentials_info, scans, company, quality=quality, stats=stats)
+    render_seconds = time.perf_counter() - start
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(pdf_bytes)
+    return dict(stats, seconds=round(render_seconds, 3))
+
+
+def load_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if os.path.isfile(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"reports": {}}
+
+
+def write_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def run(db, credentials_info, out_dir, workers=2, companies=None, force=False, quality="final"):
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    previous = manifest.get("reports", {})
+    reports = {}
+    started = time.time()
+    skipped = failed = 0
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {}
+        for key, scans in enumerate_reports(db, companies):
+            name = "/".join(key)
+            path = report_path(out_dir, key)
+            fingerprint = report_fingerprint(scans)
+            entry = previous.get(name)
+            if not force and entry and entry.get("fingerprint") == fingerprint and entry.get("quality") == quality and os.path.isfile(path):
+                reports[name] = dict(entry, status="unchanged")
+                skipped += 1
+                continue
+            future = executor.submit(render_to_file, credentials_info, scans, key[0], path, quality)
+            futures[future] = (name, path, fingerprint, len(scans))
+
+        for future in as_completed(futures):
+            name, path, fingerprint, scan_count = futures[future]
+            entry = {"path": os.path.relpath(path, out_dir), "fingerprint": fingerprint, "scans": scan_count}
+            try:
+                entry.update(future.result(), status="built")
+                print(f"built {name} ({entry['seconds']}s)")
+            except Exception as e:
+                entry.update(status="failed", error=str(e))
+                failed += 1
+                print(f"failed {name}: {e}", file=sys.stderr)
+            reports[name] = entry
+
+    manifest = {
+        "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "total_seconds": round(time.time() - started, 3),
+        "workers": workers,
+        "quality": quality,
+        "reports": reports,
+    }
+    write_manifest(out_dir, manifest)
+    print(f"{len(reports)} reports: {len(reports) - skipped - failed} built, {skipped} unchanged, {failed} failed")
+    return manifest
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--credentials", required=True, help="Firebase service account JSON file")
+    arg_parser.add_argument("--out", default="reports", help="output directory (default: reports)")
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="number of worker processes")
+    arg_parser.add_argument("--company", action="append", dest="companies", help="only build this company (repeatable)")
+    arg_parser.add_argument("--force", action="store_true", help="rebuild reports even if unchanged")
+    arg_parser.add_argument("--quality", choices=["draft", "final"], default="final", help="plot resolution (default: final)")
+    args = arg_parser.parse_args(argv)
+
+    with open(args.credentials) as f:
+        credentials_info = json.load(f)
+    db = get_client(credentials_info)
+    manifest = run(db, credentials_info, args.out, args.workers, args.companies, args.force, args.quality)
+    return 1 if any(r["status"] == "failed" for r in manifest["reports"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+import contextvars
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from google.api_core.exceptions import DeadlineExceeded, ResourceExhausted, RetryError, ServiceUnavailable
+
+from trebirth import instrumentation
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean "slow down and try again" rather than "this query is wrong".
+RETRYABLE_ERRORS = (ResourceExhausted, RetryError, DeadlineExceeded, ServiceUnavailable)
+THROTTLE_ERRORS = (ResourceExhausted,)
+
+# Reads/second budget per process, off unless set: reads are charged after a
+# query returns, so one large fetch would otherwise stall the next query.
+DEFAULT_READS_PER_SECOND = float(os.environ.get("TREBIRTH_READS_PER_SECOND") or 0) or None
+DEFAULT_DEADLINE = 60
+DEFAULT_MAX_RETRIES = 10
+
+
+class QueryFailed(Exception):
+    """A query ran out of retries or time; the last Firestore error is chained."""
+
+
+def exponential_backoff(retries, base_delay=1, max_delay=60):
+    delay = base_delay * (2 ** retries) + random.uniform(0, 1)
+    return min(delay, max_delay)
+
+
+class AIMDLimiter:
+    """Concurrency limit that grows by one per window of successes and halves on throttling."""
+
+    def __init__(self, initial=4, minimum=1, maximum=16, decrease=0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, deadline=None):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self, throttled=False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class TokenBucket:
+    """Reads-per-second budget. Reads are charged after the fact, so a large
+    result can push the balance negative and later queries wait it off."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait(self, deadline=None):
+        # Block until the balance is positive again.
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens > 0:
+                    return True
+                delay = -self.tokens / self.rate + 0.001
+            if deadline is not None and time.monotonic() + delay > deadline:
+                return False
+            time.sleep(delay)
+
+    def charge(self, reads):
+        with self._lock:
+            self._refill()
+            self.tokens -= reads
+
+
+class QueryStats:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.reads = 0
+        self.retries = 0
+        self.throttled = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "query": self.name,
+            "calls": self.calls,
+            "reads": self.reads,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "total_seconds": round(self.total_seconds, 3),
+            "mean_seconds": round(self.total_seconds / self.calls, 3) if self.calls else 0.0,
+            "max_seconds": round(self.max_seconds, 3),
+        }
+
+
+def stream_reads(docs):
+    # Firestore bills a query that matches nothing as one read.
+    return max(len(docs), 1)
+
+
+def count_reads(result):
+    # Aggregation queries cost one read per batch of up to 1000 index entries.
+    return max(math.ceil(result / 1000), 1)
+
+
+class QueryExecutor:
+    """Runs Firestore calls for one app under a shared read budget.
+
+    Every call waits for a concurrency slot (and the reads/second budget, if
+    one is set), retries quota and transient errors with exponential backoff
+    until its deadline, and is recorded per query name: calls, documents
+    read, retries and latency.
+    """
+
+    def __init__(self, reads_per_second=DEFAULT_READS_PER_SECOND, burst=None, max_concurrency=16,
+                 deadline=DEFAULT_DEADLINE, max_retries=DEFAULT_MAX_RETRIES, keep_recent=200):
+        self.bucket = TokenBucket(reads_per_second, burst) if reads_per_second else None
+        self.limiter = AIMDLimiter(maximum=max_concurrency)
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.stats = {}
+        self.recent = deque(maxlen=keep_recent)
+        self._lock = threading.Lock()
+
+    def _record(self, name, reads, retries, throttled, seconds, error=None, result=None):
+        record = {
+            "query": name, "reads": reads, "retries": retries, "seconds": round(seconds, 4),
+            "error": None if error is None else str(error), "at": time.time(),
+        }
+        with self._lock:
+            stats = self.stats.setdefault(name, QueryStats(name))
+            stats.calls += 1
+            stats.reads += reads
+            stats.retries += retries
+            stats.throttled += throttled
+            stats.errors += error is not None
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            self.recent.append(record)
+        # Attributed to the current page rerun, if the page started one.
+        instrumentation.record_query(record, result)
+
+    def run(self, name, call, reads=stream_reads, deadline=None):
+        # call() performs the request; reads(result) says how many reads it cost.
+        start = time.monotonic()
+        deadline_at = start + (deadline if deadline is not None else self.deadline)
+        retries = throttled = 0
+        while True:
+            budget_ok = self.bucket is None or self.bucket.wait(deadline_at)
+            if not budget_ok or not self.limiter.acquire(deadline_at):
+                error = QueryFailed(f"{name}: deadline reached waiting for read budget")
+                self._record(name, 0, retries, throttled, time.monotonic() - start, error)
+                raise error
+            throttle = False
+            try:
+                result = call()
+            except RETRYABLE_ERRORS as e:
+                throttle = isinstance(e, THROTTLE_ERRORS)
+                throttled += throttle
+                delay = exponential_backoff(retries)
+                if retries >= self.max_retries or time.monotonic() + delay > deadline_at:
+                    self._record(name, 0, retries, throttled, time.monotonic() - start, e)
+                    raise QueryFailed(f"{name}: gave up after {retries + 1} attempts: {e}") from e
+                logger.warning("%s: %s, retrying in %.1fs (attempt %d)", name, type(e).__name__, delay, retries + 1)
+                retries += 1
+            except Exception as e:
+                self._record(name, 0, retries, throttled, time.monotonic() - start, e)
+                raise
+            else:
+                cost = reads(result)
+                if self.bucket is not None:
+                    self.bucket.charge(cost)
+                self._record(name, cost, retries, throttled, time.monotonic() - start, result=result)
+                return result
+            finally:
+                self.limiter.release(throttled=throttle)
+            # Back off without holding a concurrency slot.
+            time.sleep(delay)
+
+    def stream(self, query, name="query", deadline=None):
+        return self.run(name, lambda: list(query.stream()), deadline=deadline)
+
+    def get(self, document_ref, name="get", deadline=None):
+        return self.run(name, document_ref.get, reads=lambda _: 1, deadline=deadline)
+
+    def get_all(self, db, refs, field_paths=None, name="get_all", deadline=None):
+        refs = list(refs)
+        return self.run(name, lambda: list(db.get_all(refs, field_paths=field_paths)),
+                        reads=lambda _: max(len(refs), 1), deadline=deadline)
+
+    def count(self, query, name="count", deadline=None):
+        return self.run(name, lambda: int(query.count().get()[0][0].value), reads=count_reads, deadline=deadline)
+
+    def map(self, method, items, name="query", deadline=None):
+        # Run one call per item in parallel; the AIMD limiter decides how many
+        # are actually in flight. Each call runs in a copy of the caller's
+        # context so it is counted against the caller's page rerun.
+        context = contextvars.copy_context()
+        with ThreadPoolExecutor(max_workers=self.limiter.maximum) as pool:
+            return list(pool.map(lambda item: context.copy().run(method, item, name=name, deadline=deadline), items))
+
+    def snapshot(self):
+        with self._lock:
+            return [stats.as_dict() for stats in self.stats.values()]
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(app="default", **kwargs):
+    # One executor, and so one read budget, per app per process.
+    with _executors_lock:
+        if app not in _executors:
+            _executors[app] = QueryExecutor(**kwargs)
+        return _executors[app]
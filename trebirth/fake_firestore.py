@@ -0,0 +1,387 @@
+"""In-process stand-in for the parts of the Firestore client the apps use.
+
+Covers collection/document references, where (positional or filter=FieldFilter),
+order_by, limit, offset, start_at/start_after cursors, select, count, stream/get
+and get_all, with Firestore's value ordering and the usual comparison and array
+operators. Snapshots carry an update_time that moves on with every write.
+Documents live in plain dicts, so a benchmark run against it is offline and
+deterministic. Indexes, transactions and listeners are not modelled.
+"""
+import datetime
+import functools
+import itertools
+import threading
+
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+_NUMBER_TYPES = (int, float)
+
+
+def _value_key(value):
+    # Firestore's cross-type order: null < bool < number < timestamp < string
+    # < bytes < reference < array < map.
+    if value is None:
+        return (0,)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, _NUMBER_TYPES):
+        return (2, value)
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return (3, value.timestamp())
+    if isinstance(value, str):
+        return (4, value)
+    if isinstance(value, bytes):
+        return (5, value)
+    if isinstance(value, FakeDocumentReference):
+        return (6, value.path)
+    if hasattr(value, "tolist"):
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        return (8, tuple(_value_key(item) for item in value))
+    if isinstance(value, dict):
+        return (9, tuple((k, _value_key(v)) for k, v in sorted(value.items())))
+    return (10, repr(value))
+
+
+_MISSING = object()
+
+# FieldPath.document_id(): orders and filters on the document id.
+DOCUMENT_ID = "__name__"
+
+
+def _order_value(doc_id, data, field_path):
+    if field_path == DOCUMENT_ID:
+        return doc_id
+    return _get_field(data, field_path)
+
+
+def _get_field(data, field_path):
+    for part in field_path.split("."):
+        if not isinstance(data, dict) or part not in data:
+            return _MISSING
+        data = data[part]
+    return data
+
+
+def _project(data, field_paths):
+    if field_paths is None:
+        return data
+    projected = {}
+    for field_path in field_paths:
+        value = _get_field(data, field_path)
+        if value is _MISSING:
+            continue
+        target = projected
+        parts = field_path.split(".")
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return projected
+
+
+def _fresh(value):
+    # Each read hands out fresh containers, like a deserialized response would.
+    # NumPy arrays (how the synthetic data stores signals) come back as lists.
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        return dict(value)
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return value
+
+
+def _copy(data):
+    return {key: _fresh(value) for key, value in data.items()}
+
+
+def _matches(value, op, operand):
+    if value is _MISSING:
+        return False
+    if hasattr(value, "tolist"):
+        value = value.tolist()
+    key = _value_key(value)
+    if op == "==":
+        return key == _value_key(operand)
+    if op == "!=":
+        return value is not None and key != _value_key(operand)
+    if op in ("<", "<=", ">", ">="):
+        other = _value_key(operand)
+        if key[0] != other[0]:
+            # Range filters only match values of the same type.
+            return False
+        return {"<": key < other, "<=": key <= other, ">": key > other, ">=": key >= other}[op]
+    if op == "in":
+        return key in {_value_key(item) for item in operand}
+    if op == "not-in":
+        return value is not None and key not in {_value_key(item) for item in operand}
+    if op == "array_contains" or op == "array-contains":
+        return isinstance(value, list) and _value_key(operand) in {_value_key(item) for item in value}
+    if op == "array_contains_any" or op == "array-contains-any":
+        return isinstance(value, list) and bool({_value_key(item) for item in value} & {_value_key(item) for item in operand})
+    raise ValueError(f"Unsupported operator {op!r}")
+
+
+@functools.total_ordering
+class _Descending:
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+    def __lt__(self, other):
+        return self.key > other.key
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference, data, field_paths=None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self.update_time = reference._client._update_time(reference.collection_name, reference.id) if self.exists else None
+        self._data = data
+        self._field_paths = field_paths
+
+    def to_dict(self):
+        if self._data is None:
+            return None
+        return _copy(_project(self._data, self._field_paths))
+
+    def get(self, field_path):
+        value = _get_field(self._data or {}, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return _fresh(value)
+
+
+class FakeDocumentReference:
+    def __init__(self, client, collection_name, doc_id):
+        self._client = client
+        self.collection_name = collection_name
+        self.id = doc_id
+        self.path = f"{collection_name}/{doc_id}"
+
+    def get(self, field_paths=None):
+        return FakeDocumentSnapshot(self, self._client._documents(self.collection_name).get(self.id), field_paths)
+
+    def set(self, data, merge=False):
+        with self._client._lock:
+            documents = self._client._documents(self.collection_name)
+            if merge and self.id in documents:
+                documents[self.id] = dict(documents[self.id], **data)
+            else:
+                documents[self.id] = dict(data)
+            self._client._touch(self.collection_name, [self.id])
+
+    def update(self, data):
+        with self._client._lock:
+            documents = self._client._documents(self.collection_name)
+            if self.id not in documents:
+                raise KeyError(f"No document to update: {self.path}")
+            documents[self.id] = dict(documents[self.id], **data)
+            self._client._touch(self.collection_name, [self.id])
+
+    def delete(self):
+        with self._client._lock:
+            self._client._documents(self.collection_name).pop(self.id, None)
+            self._client._update_times.get(self.collection_name, {}).pop(self.id, None)
+
+
+class FakeAggregationResult:
+    def __init__(self, alias, value):
+        self.alias = alias
+        self.value = value
+
+
+class FakeAggregationQuery:
+    def __init__(self, query, alias):
+        self._query = query
+        self._alias = alias or "field_1"
+
+    def get(self):
+        return [[FakeAggregationResult(self._alias, sum(1 for _ in self._query._results()))]]
+
+    def stream(self):
+        return iter(self.get())
+
+
+class FakeQuery:
+    """Immutable query; every builder method returns a new query, as in Firestore."""
+
+    ASCENDING = ASCENDING
+    DESCENDING = DESCENDING
+
+    def __init__(self, client, collection_name, filters=(), orders=(), limit=None, offset=0,
+                 field_paths=None, cursor=None):
+        self._client = client
+        self._collection_name = collection_name
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._offset = offset
+        self._field_paths = field_paths
+        self._cursor = cursor
+
+    def _replace(self, **changes):
+        state = dict(filters=self._filters, orders=self._orders, limit=self._limit, offset=self._offset,
+                     field_paths=self._field_paths, cursor=self._cursor)
+        state.update(changes)
+        return FakeQuery(self._client, self._collection_name, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._replace(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction=ASCENDING):
+        return self._replace(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._replace(limit=count)
+
+    def offset(self, count):
+        return self._replace(offset=count)
+
+    def select(self, field_paths):
+        return self._replace(field_paths=list(field_paths))
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._replace(cursor=(document_fields_or_snapshot, False))
+
+    def start_at(self, document_fields_or_snapshot):
+        return self._replace(cursor=(document_fields_or_snapshot, True))
+
+    def count(self, alias=None):
+        return FakeAggregationQuery(self, alias)
+
+    def _sort_key(self, doc_id, data):
+        key = []
+        for field_path, direction in self._orders:
+            value = _value_key(_order_value(doc_id, data, field_path))
+            key.append(_Descending(value) if direction == DESCENDING else value)
+        # Document id breaks ties, in the direction of the last ordering.
+        last_descending = bool(self._orders) and self._orders[-1][1] == DESCENDING
+        key.append(_Descending(doc_id) if last_descending else doc_id)
+        return tuple(key)
+
+    def _cursor_key(self):
+        position, inclusive = self._cursor
+        if isinstance(position, FakeDocumentSnapshot):
+            data = self._client._documents(self._collection_name).get(position.id) or {}
+            return self._sort_key(position.id, data), inclusive
+        if isinstance(position, dict):
+            values = [position.get(field_path) for field_path, _ in self._orders]
+        else:
+            values = list(position)
+        key = [
+            _Descending(_value_key(value)) if direction == DESCENDING else _value_key(value)
+            for value, (_, direction) in zip(values, self._orders)
+        ]
+        # Field values alone: a prefix compares before every document with those values.
+        return tuple(key), inclusive
+
+    def _matching(self):
+        with self._client._lock:
+            documents = list(self._client._documents(self._collection_name).items())
+        for doc_id, data in documents:
+            if all(_matches(_get_field(data, f), op, value) for f, op, value in self._filters):
+                # Firestore drops documents that lack an order_by field.
+                if all(_order_value(doc_id, data, f) is not _MISSING for f, _ in self._orders):
+                    yield doc_id, data
+
+    def _results(self):
+        rows = sorted(((self._sort_key(doc_id, data), doc_id, data) for doc_id, data in self._matching()),
+                      key=lambda row: row[0])
+        if self._cursor is not None:
+            cursor, inclusive = self._cursor_key()
+            width = len(cursor)
+            if inclusive:
+                rows = [row for row in rows if row[0][:width] >= cursor]
+            else:
+                rows = [row for row in rows if row[0][:width] > cursor]
+        end = None if self._limit is None else self._offset + self._limit
+        for _, doc_id, data in itertools.islice(rows, self._offset, end):
+            reference = FakeDocumentReference(self._client, self._collection_name, doc_id)
+            yield FakeDocumentSnapshot(reference, data, self._field_paths)
+
+    def stream(self, transaction=None):
+        return self._results()
+
+    def get(self, transaction=None):
+        return list(self._results())
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, client, name):
+        super().__init__(client, name)
+        self.id = name
+
+    def document(self, doc_id):
+        return FakeDocumentReference(self._client, self._collection_name, doc_id)
+
+    def add(self, data, document_id=None):
+        with self._client._lock:
+            doc_id = document_id or f"auto{next(self._client._ids):012d}"
+        reference = self.document(doc_id)
+        reference.set(data)
+        return None, reference
+
+    def list_documents(self):
+        with self._client._lock:
+            ids = list(self._client._documents(self._collection_name))
+        return [self.document(doc_id) for doc_id in ids]
+
+
+class FakeClient:
+    """Firestore client backed by {collection: {doc_id: data}}."""
+
+    def __init__(self, collections=None):
+        self._data = {name: dict(docs) for name, docs in (collections or {}).items()}
+        self._lock = threading.RLock()
+        self._ids = itertools.count()
+        self._update_times = {}
+        self._clock = None
+        for name, docs in self._data.items():
+            self._touch(name, docs)
+
+    def _touch(self, collection_name, doc_ids):
+        # Stamp a write like Firestore's update_time, strictly later than the last one.
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if self._clock is not None and now <= self._clock:
+            now = self._clock + datetime.timedelta(microseconds=1)
+        self._clock = now
+        times = self._update_times.setdefault(collection_name, {})
+        for doc_id in doc_ids:
+            times[doc_id] = now
+
+    def _update_time(self, collection_name, doc_id):
+        return self._update_times.get(collection_name, {}).get(doc_id)
+
+    def _documents(self, collection_name):
+        return self._data.setdefault(collection_name, {})
+
+    def collection(self, name):
+        return FakeCollectionReference(self, name)
+
+    def document(self, path):
+        collection_name, doc_id = path.split("/", 1)
+        return FakeDocumentReference(self, collection_name, doc_id)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        for reference in references:
+            yield reference.get(field_paths=field_paths)
+
+    def collections(self):
+        return [self.collection(name) for name in self._data]
+
+    def load(self, collection_name, documents):
+        # Bulk insert {doc_id: data}, replacing documents with the same id.
+        with self._lock:
+            self._documents(collection_name).update(documents)
+            self._touch(collection_name, documents)
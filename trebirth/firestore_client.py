@@ -0,0 +1,80 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Document read once when a client is created, so the gRPC channel and TLS
+# handshake are set up before the first real query. It does not need to exist.
+WARM_UP_DOCUMENT = "_warmup/ping"
+
+# Set to a trebirth.synthetic preset ("small", "large", optionally ":<seed>")
+# to point every app at an in-process fake loaded with synthetic scans instead
+# of the live project. Credentials are ignored; all apps share the one fake.
+FAKE_ENV = "TREBIRTH_FAKE_FIRESTORE"
+
+_clients = {}
+_lock = threading.Lock()
+_pid = os.getpid()
+
+
+def credential_key(credentials):
+    # A service account JSON path, or its parsed contents (e.g. st.secrets["firebase_admin"]).
+    if credentials is None:
+        return "default"
+    if isinstance(credentials, (str, os.PathLike)):
+        return "file:" + os.path.abspath(credentials)
+    info = json.dumps(dict(credentials), sort_keys=True, default=str)
+    return "info:" + hashlib.sha1(info.encode("utf-8")).hexdigest()
+
+
+def _create_fake_client(spec):
+    from trebirth.synthetic import fake_client
+    preset, _, seed = spec.partition(":")
+    return fake_client(preset or "small", int(seed or 0))
+
+
+def _create_client(credentials):
+    from google.cloud import firestore
+    if credentials is None:
+        return firestore.Client()
+    if isinstance(credentials, (str, os.PathLike)):
+        return firestore.Client.from_service_account_json(os.fspath(credentials))
+    return firestore.Client.from_service_account_info(dict(credentials))
+
+
+def warm_up(client):
+    try:
+        client.document(WARM_UP_DOCUMENT).get()
+    except Exception as e:
+        # The client still works; the first query just pays the connection cost.
+        logger.warning("Firestore warm-up failed: %s", e)
+
+
+def get_client(credentials=None, warm=True):
+    """Return the process-wide Firestore client for these credentials.
+
+    Streamlit re-executes page scripts on every rerun, but this module is only
+    imported once per server process, so every rerun, session and thread shares
+    one client (and its gRPC channel) per credential.
+    """
+    global _pid
+    fake = os.environ.get(FAKE_ENV)
+    key = "fake:" + fake if fake else credential_key(credentials)
+    client = _clients.get(key)
+    if client is not None and _pid == os.getpid():
+        return client
+    with _lock:
+        if _pid != os.getpid():
+            # gRPC channels must not be shared with a forked child.
+            _clients.clear()
+            _pid = os.getpid()
+        client = _clients.get(key)
+        if client is None:
+            client = _create_fake_client(fake) if fake else _create_client(credentials)
+            if warm and not fake:
+                warm_up(client)
+            _clients[key] = client
+    return client
@@ -0,0 +1,231 @@
+import contextvars
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+# The panel is for the internal admin apps only; "0" turns it off there too.
+PANEL_ENV = "TREBIRTH_INSTRUMENTATION"
+# Dumps always go to this file, never to a path taken from the page.
+DUMP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         "benchmarks", "results", "instrumentation.jsonl")
+HISTORY_RUNS = 20
+
+_current_run = contextvars.ContextVar("trebirth_page_run", default=None)
+_dump_lock = threading.Lock()
+
+
+def value_size(value):
+    # Firestore's storage size rules: strings are UTF-8 bytes + 1, numbers and
+    # timestamps 8, booleans and null 1, maps/arrays the sum of their parts.
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float, datetime.datetime)):
+        return 8
+    if isinstance(value, str):
+        return len(value.encode("utf-8")) + 1
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(key.encode("utf-8")) + 1 + value_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        # Sized from the first element, so scan arrays are not walked sample by sample.
+        return len(value) * value_size(value[0]) if value else 0
+    return 16
+
+
+def document_size(snapshot):
+    # Document name plus fields, plus Firestore's fixed 32 bytes per document.
+    if not getattr(snapshot, "exists", True):
+        return 0
+    data = snapshot.to_dict() or {}
+    return len(snapshot.reference.path.encode("utf-8")) + 1 + value_size(data) + 32
+
+
+def payload_bytes(result):
+    # An estimate: the first document's size times the number of documents.
+    if isinstance(result, list):
+        docs = [doc for doc in result if hasattr(doc, "to_dict") and getattr(doc, "exists", True)]
+        return len(docs) * document_size(docs[0]) if docs else 0
+    if hasattr(result, "to_dict"):
+        return document_size(result)
+    return 0
+
+
+class PageRun:
+    """Firestore usage of one Streamlit rerun of one page."""
+
+    def __init__(self, page, session_id=None):
+        self.page = page
+        self.session_id = session_id
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.queries = []
+        self.cache = defaultdict(lambda: {"hits": 0, "misses": 0})
+        self._misses = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record_query(self, record, result=None):
+        record = dict(record, bytes=payload_bytes(result) if result is not None else 0)
+        with self._lock:
+            self.queries.append(record)
+
+    def summary(self):
+        with self._lock:
+            queries = list(self.queries)
+            hits = sum(c["hits"] for c in self.cache.values())
+            misses = sum(c["misses"] for c in self.cache.values())
+        return {
+            "page": self.page,
+            "session_id": self.session_id,
+            "run_id": self.run_id,
+            "started": self.started,
+            "queries": len(queries),
+            "reads": sum(q["reads"] for q in queries),
+            "bytes": sum(q["bytes"] for q in queries),
+            "query_ms": round(sum(q["seconds"] for q in queries) * 1000, 1),
+            "retries": sum(q["retries"] for q in queries),
+            "errors": sum(q["error"] is not None for q in queries),
+            "cache_hits": hits,
+            "cache_misses": misses,
+            "elapsed_ms": round((time.time() - self.started) * 1000, 1),
+        }
+
+    def by_query(self):
+        # One row per query name, for the panel table.
+        rows = {}
+        with self._lock:
+            for q in self.queries:
+                row = rows.setdefault(q["query"], {"query": q["query"], "calls": 0, "reads": 0, "bytes": 0, "ms": 0.0, "retries": 0})
+                row["calls"] += 1
+                row["reads"] += q["reads"]
+                row["bytes"] += q["bytes"]
+                row["ms"] = round(row["ms"] + q["seconds"] * 1000, 1)
+                row["retries"] += q["retries"]
+        return list(rows.values())
+
+
+def _session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+
+def start_page_run(page):
+    # Call once at the top of an admin page; queries made during this rerun
+    # (including from executor worker threads) are attributed to the returned
+    # PageRun. Returns None, and records nothing, when the panel is off.
+    run = PageRun(page, _session_id()) if panel_enabled() else None
+    _current_run.set(run)
+    return run
+
+
+def current_page_run():
+    return _current_run.get()
+
+
+def record_query(record, result=None):
+    run = _current_run.get()
+    if run is not None:
+        run.record_query(record, result)
+
+
+def cache_miss(name):
+    # Call inside the body of a cached function: it only runs on a miss.
+    run = _current_run.get()
+    if run is not None:
+        with run._lock:
+            run._misses[name] += 1
+
+
+def track_cache(name, cached_function, *args, **kwargs):
+    # Call a st.cache_data/st.cache_resource function and count a hit unless
+    # its body reported a miss with cache_miss(name).
+    run = _current_run.get()
+    if run is None:
+        return cached_function(*args, **kwargs)
+    before = run._misses[name]
+    result = cached_function(*args, **kwargs)
+    with run._lock:
+        run.cache[name]["misses" if run._misses[name] > before else "hits"] += 1
+    return result
+
+
+def tracked_cache(name, cache):
+    """Apply a Streamlit cache decorator and count its hits and misses.
+
+        @tracked_cache("fetch_data", st.cache_data)
+        def fetch_data(company_name): ...
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def body(*args, **kwargs):
+            cache_miss(name)
+            return function(*args, **kwargs)
+
+        cached = cache(body)
+
+        @functools.wraps(function)
+        def call(*args, **kwargs):
+            return track_cache(name, cached, *args, **kwargs)
+
+        call.clear = getattr(cached, "clear", None)
+        return call
+    return decorate
+
+
+def dump_jsonl(run, path=DUMP_PATH):
+    # One line per query and one summary line for the rerun.
+    summary = run.summary()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _dump_lock, open(path, "a") as f:
+        for q in run.queries:
+            f.write(json.dumps(dict(q, type="query", page=run.page, run_id=run.run_id), default=str) + "\n")
+        f.write(json.dumps(dict(summary, type="run", cache=dict(run.cache)), default=str) + "\n")
+
+
+def panel_enabled():
+    return os.environ.get(PANEL_ENV) != "0"
+
+
+def show_instrumentation_panel(run):
+    """Sidebar panel with this rerun's reads, bytes, latency and cache hits.
+
+    Shown for runs started with start_page_run(), which only the admin
+    pages call. Dumps are appended to DUMP_PATH.
+    """
+    if run is None:
+        return
+    import streamlit as st
+
+    summary = run.summary()
+    history = st.session_state.setdefault("_trebirth_instrumentation", [])
+    history.append(summary)
+    del history[:-HISTORY_RUNS]
+
+    with st.sidebar.expander("Firestore usage", expanded=False):
+        col1, col2 = st.columns(2)
+        col1.metric("Document reads", summary["reads"])
+        col2.metric("Payload (est.)", f"{summary['bytes'] / 1024:.1f} KB")
+        col1.metric("Query time", f"{summary['query_ms']:.0f} ms")
+        col2.metric("Cache hits", f"{summary['cache_hits']}/{summary['cache_hits'] + summary['cache_misses']}")
+        rows = run.by_query()
+        if rows:
+            st.dataframe(rows, hide_index=True, width="stretch")
+        st.caption(f"Last {len(history)} reruns of this session")
+        st.dataframe(
+            [{k: s[k] for k in ("reads", "bytes", "query_ms", "cache_hits", "elapsed_ms")} for s in history],
+            hide_index=True, width="stretch",
+        )
+        if st.checkbox("Append every rerun", key="_trebirth_dump_every"):
+            dump_jsonl(run)
+        elif st.button("Dump this rerun", key="_trebirth_dump_now"):
+            dump_jsonl(run)
+            st.toast(f"Wrote {len(run.queries) + 1} lines to {DUMP_PATH}")
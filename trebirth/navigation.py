@@ -0,0 +1,117 @@
+from bisect import bisect_left, insort
+
+
+def scan_month(scan):
+    # scan_date is "%Y-%m-%d" or "Unknown Date"; only dated scans get a month.
+    scan_date = scan.get("scan_date", "")
+    if len(scan_date) >= 7 and scan_date[:4].isdigit() and scan_date[4] == "-":
+        return scan_date[:7]
+    return None
+
+
+def _level(value):
+    # Keys are kept as text: the same field is an int in some documents and a
+    # str in others, and each level's children are one sorted list.
+    return "" if value is None else str(value).strip()
+
+
+def scan_path(scan):
+    # City -> Area -> Month -> Apartment, cut short at the first missing level.
+    path = []
+    for key in (
+        _level(scan.get("City")),
+        _level(scan.get("Area")),
+        scan_month(scan),
+        str(scan.get("Apartment") or "N/A"),
+    ):
+        if not key:
+            break
+        path.append(key)
+    return tuple(path)
+
+
+class ScanIndex:
+    """City -> Area -> Month -> Apartment -> scan ids for one company.
+
+    Every level keeps its children as a sorted list, so each sidebar dropdown is
+    a single dict lookup, and each apartment its scans in timestamp order
+    whatever order they were fetched in. Scans can be added or replaced one at a time, which
+    lets a refresh merge new documents without rebuilding the whole index.
+    """
+
+    def __init__(self, scans=()):
+        self.scans = {}
+        self._children = {(): []}
+        self._scan_ids = {}
+        self._counts = {}
+        self._paths = {}
+        self._next_local_id = 0
+        for scan in scans:
+            self.add(scan)
+
+    def __len__(self):
+        return len(self.scans)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.scans
+
+    def add(self, scan):
+        doc_id = scan.get("doc_id")
+        if not doc_id:
+            doc_id = scan["doc_id"] = f"_local{self._next_local_id}"
+            self._next_local_id += 1
+        if doc_id in self.scans:
+            self.remove(doc_id)
+        path = scan_path(scan)
+        self.scans[doc_id] = scan
+        self._paths[doc_id] = path
+        for depth in range(1, len(path) + 1):
+            prefix = path[:depth]
+            if prefix not in self._counts:
+                self._counts[prefix] = 0
+                self._children[prefix] = []
+                insort(self._children[prefix[:-1]], prefix[-1])
+            self._counts[prefix] += 1
+        if len(path) == 4:
+            insort(self._scan_ids.setdefault(path, []), doc_id, key=self._scan_order)
+
+    def _scan_order(self, doc_id):
+        # Scans without a timestamp go last; ties keep document id order.
+        timestamp = self.scans[doc_id].get("timestamp")
+        return (timestamp is None, str(timestamp) if timestamp is not None else "", doc_id)
+
+    def remove(self, doc_id):
+        scan = self.scans.pop(doc_id, None)
+        if scan is None:
+            return None
+        path = self._paths.pop(doc_id)
+        if len(path) == 4:
+            ids = self._scan_ids[path]
+            ids.remove(doc_id)
+            if not ids:
+                del self._scan_ids[path]
+        for depth in range(len(path), 0, -1):
+            prefix = path[:depth]
+            self._counts[prefix] -= 1
+            if self._counts[prefix] == 0:
+                del self._counts[prefix]
+                del self._children[prefix]
+                siblings = self._children[prefix[:-1]]
+                del siblings[bisect_left(siblings, prefix[-1])]
+        return scan
+
+    def cities(self):
+        return self._children[()]
+
+    def areas(self, city):
+        return self._children.get((city,), [])
+
+    def months(self, city, area):
+        return self._children.get((city, area), [])
+
+    def apartments(self, city, area, month):
+        # {apartment: [scan, ...]} for the selected City/Area/Month.
+        return {
+            apartment: [self.scans[doc_id] for doc_id in self._scan_ids[(city, area, month, apartment)]]
+            for apartment in self._children.get((city, area, month), [])
+        }
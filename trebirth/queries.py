@@ -0,0 +1,148 @@
+from datetime import datetime
+
+from google.cloud.firestore import FieldFilter
+from google.cloud.firestore_v1.field_path import FieldPath
+
+from trebirth.executor import get_executor
+from trebirth.timestamps import add_local_dates
+
+SCANS_COLLECTION = "pestcontrolindia"
+
+# Fields the report viewer needs to build its dropdowns and tables. RadarRaw is
+# deliberately left out and only loaded for the scans that go into a report.
+SCAN_METADATA_FIELDS = [
+    "CompanyName",
+    "City",
+    "Area",
+    "Apartment",
+    "Room",
+    "Incharge",
+    "Devicename",
+    "ScanDuration",
+    "Positioned",
+    "DamageVisible",
+    "timestamp",
+]
+
+PAGE_SIZE = 500
+
+# Some stored CompanyName values carry stray whitespace, which the apps used to
+# strip() away. The server filter matches the name with these around it.
+COMPANY_NAME_PADDING = ("", " ", "  ", "\t", "\n", "\r\n")
+
+
+def company_name_variants(company_name):
+    name = company_name.strip()
+    return [lead + name + trail for lead in ("", " ") for trail in COMPANY_NAME_PADDING]
+
+
+def month_bounds(month):
+    # "2025-03" -> ("2025-03", "2025-04"). Scan timestamps in this collection are
+    # stored as "%Y-%m-%d %H:%M:%S" strings, so a string range selects the month.
+    start = datetime.strptime(month, "%Y-%m")
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return start.strftime("%Y-%m"), end.strftime("%Y-%m")
+
+
+def company_scans_query(db, company_name, city=None, area=None, month=None, since=None, fields=SCAN_METADATA_FIELDS):
+    # Every filter below is applied by Firestore; see firestore.indexes.json for
+    # the composite indexes these combinations need. company_name=None reads
+    # every company, which only the offline batch jobs do.
+    query = db.collection(SCANS_COLLECTION)
+    if company_name:
+        query = query.where(filter=FieldFilter("CompanyName", "in", company_name_variants(company_name)))
+    if city:
+        query = query.where(filter=FieldFilter("City", "==", city))
+    if area:
+        query = query.where(filter=FieldFilter("Area", "==", area))
+    if month:
+        start, end = month_bounds(month)
+        query = query.where(filter=FieldFilter("timestamp", ">=", start))
+        query = query.where(filter=FieldFilter("timestamp", "<", end))
+    if since:
+        query = query.where(filter=FieldFilter("timestamp", ">=", since))
+    if fields:
+        query = query.select(fields)
+    if month or since:
+        # A timestamp range only matches scans that have one, and Firestore
+        # needs the range field to be the first ordering.
+        return query.order_by("timestamp")
+    # Ordered queries leave out documents that lack the order field, so the
+    # full listing pages by document ID; ScanIndex keeps scans in timestamp order.
+    return query.order_by(FieldPath.document_id())
+
+
+def stream_pages(query, page_size=PAGE_SIZE, executor=None, name="scan_page"):
+    # Walk an ordered query page by page with cursors instead of one long stream.
+    executor = executor or get_executor()
+    last_doc = None
+    while True:
+        page = query.limit(page_size)
+        if last_doc is not None:
+            page = page.start_after(last_doc)
+        docs = executor.stream(page, name=name)
+        for doc in docs:
+            yield doc
+        if len(docs) < page_size:
+            return
+        last_doc = docs[-1]
+
+
+def stream_company_scans(db, company_name, city=None, area=None, month=None, since=None, page_size=PAGE_SIZE,
+                         executor=None, versions=None):
+    # versions, if given, collects {doc_id: update_time} of the scans streamed.
+    query = company_scans_query(db, company_name, city=city, area=area, month=month, since=since)
+    for doc in stream_pages(query, page_size, executor, name="company_scans"):
+        data = doc.to_dict()
+        data["doc_id"] = doc.id
+        if versions is not None:
+            versions[doc.id] = doc.update_time
+        yield data
+
+
+def company_scan_ids(db, company_name, page_size=PAGE_SIZE, executor=None):
+    # (doc_id, update_time) of every scan of the company, from a keys-only query.
+    query = company_scans_query(db, company_name, fields=None).select([])
+    for doc in stream_pages(query, page_size, executor, name="company_scan_ids"):
+        yield doc.id, doc.update_time
+
+
+def fetch_scans(db, doc_ids, fields=SCAN_METADATA_FIELDS, chunk_size=100, executor=None):
+    # The given fields of just the given scans, as {doc_id: data}; ids that no
+    # longer exist are left out.
+    executor = executor or get_executor()
+    collection = db.collection(SCANS_COLLECTION)
+    doc_ids = list(doc_ids)
+    scans = {}
+    for start in range(0, len(doc_ids), chunk_size):
+        refs = [collection.document(doc_id) for doc_id in doc_ids[start:start + chunk_size]]
+        for snapshot in executor.get_all(db, refs, field_paths=fields, name="scans"):
+            if snapshot.exists:
+                scans[snapshot.id] = snapshot.to_dict()
+    return scans
+
+
+def add_scan_dates(scans):
+    # Set scan_date ("%Y-%m-%d" local date, or "Unknown Date") on a batch of scans
+    # in one vectorized pass.
+    return add_local_dates(scans, field="timestamp", out_field="scan_date")
+
+
+def fetch_radar(db, doc_ids, chunk_size=100, executor=None):
+    # Load RadarRaw for just the given scans, returned as {doc_id: RadarRaw}.
+    scans = fetch_scans(db, doc_ids, ["RadarRaw"], chunk_size, executor)
+    return {doc_id: data.get("RadarRaw", []) for doc_id, data in scans.items()}
+
+
+def attach_radar(db, scans):
+    # Fill in RadarRaw on scan dicts that came from the metadata-only query.
+    missing = [scan["doc_id"] for scan in scans if "RadarRaw" not in scan and "doc_id" in scan]
+    if missing:
+        radar = fetch_radar(db, missing)
+        for scan in scans:
+            if "RadarRaw" not in scan and "doc_id" in scan:
+                scan["RadarRaw"] = radar.get(scan["doc_id"], [])
+    return scans
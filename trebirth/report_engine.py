@@ -0,0 +1,305 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Flowable, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from trebirth.validation import validate_scans
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Report_Generation_Customer_WebApp")
+
+# Fonts and styles are built once per process and shared by every report;
+# nothing below mutates them once they are created.
+_lock = threading.Lock()
+_fonts_registered = None
+_styles = None
+
+# Plot images are rendered straight at the resolution they are printed at.
+# Plotly lays the figure out PLOT_LAYOUT_WIDTH px wide and kaleido scales the
+# bitmap, so margins and line widths look the same in both modes.
+QUALITY_DPI = {"draft": 72, "final": 144}
+PLOT_LAYOUT_WIDTH = 800
+
+
+def register_fonts():
+    global _fonts_registered
+    with _lock:
+        if _fonts_registered is None:
+            try:
+                pdfmetrics.registerFont(TTFont("ARLRDBD", os.path.join(FONT_DIR, "ARLRDBD.TTF")))
+                pdfmetrics.registerFont(TTFont("ARIAL", os.path.join(FONT_DIR, "ARIAL.TTF")))
+                _fonts_registered = True
+            except Exception:
+                _fonts_registered = False
+    return _fonts_registered
+
+
+def report_styles():
+    global _styles
+    if _styles is not None:
+        return _styles
+    fonts = register_fonts()
+    with _lock:
+        if _styles is None:
+            sample = getSampleStyleSheet()
+            heading = ParagraphStyle("TrebirthHeading", parent=sample["Heading1"])
+            body = ParagraphStyle("TrebirthBody", parent=sample["Normal"], fontSize=12)
+            if fonts:
+                heading.fontName = "ARLRDBD"
+                body.fontName = "ARIAL"
+            _styles = {
+                "heading_centered": ParagraphStyle(
+                    "HeadingStyleCentered", parent=heading, fontSize=20,
+                    textColor=colors.darkblue, alignment=1, spaceAfter=10, underline=True, bold=True
+                ),
+                "heading_left": ParagraphStyle(
+                    "HeadingStyleLeft", parent=heading, fontSize=20,
+                    textColor=colors.darkblue, alignment=0, spaceAfter=10, underline=True, bold=True
+                ),
+                "heading_sub": ParagraphStyle(
+                    "HeadingStyleSub", parent=heading, fontSize=16,
+                    textColor=colors.black, alignment=0, spaceAfter=10, underline=True, bold=True
+                ),
+                "body": body,
+                "bold": ParagraphStyle("BoldStyle", parent=body, fontSize=12, fontName=heading.fontName),
+                "fonts": fonts,
+            }
+    return _styles
+
+
+def preprocess_radar_data(radar_raw, validated=False):
+    # Process raw radar list into cleaned pandas DataFrame with no missing values
+    df_radar = pd.DataFrame(radar_raw, columns=["Radar"])
+    if validated:
+        return df_radar
+    df_radar.dropna(inplace=True)
+    df_radar.fillna(df_radar.mean(), inplace=True)
+    return df_radar
+
+
+def plot_time_domain(preprocessed_scan, device_name, timestamp, scan_duration, sampling_rate=100):
+    # Create Plotly line plot of radar values over time with minimal axes
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    time_seconds = np.arange(len(preprocessed_scan)) / sampling_rate
+    fig.add_trace(
+        go.Scatter(
+            x=time_seconds,
+            y=preprocessed_scan["Radar"],
+            mode="lines",
+            name=f"{device_name} - Unknown Timestamp",
+            line=dict(color="blue"),
+        )
+    )
+    fig.update_layout(
+        template="plotly_white",
+        xaxis_title=None,
+        yaxis_title=None,
+        xaxis=dict(showticklabels=False),
+        yaxis=dict(showticklabels=False),
+        legend_title="Scan",
+        font=dict(color="black"),
+        plot_bgcolor="rgba(0,0,0,0)",
+        paper_bgcolor="rgba(0,0,0,0)",
+        margin=dict(l=100, r=100, t=100, b=100),
+        shapes=[
+            dict(
+                type="rect",
+                x0=0,
+                y0=0,
+                x1=1,
+                y1=1,
+                xref="paper",
+                yref="paper",
+                line=dict(color="black", width=2),
+            )
+        ],
+    )
+    return fig
+
+
+class SharedImage(Flowable):
+    """Draws an ImageReader that may be shared by several flowables.
+
+    Reusing one reader per distinct PNG means it is decoded once and ReportLab
+    embeds it as a single image XObject referenced from every page using it.
+    """
+
+    def __init__(self, reader, width, height):
+        Flowable.__init__(self)
+        self.reader = reader
+        self.width = width
+        self.height = height
+        self.hAlign = "CENTER"
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        self.canv.drawImage(self.reader, 0, 0, self.width, self.height, mask="auto")
+
+
+class ReportImages:
+    """Renders plot images for one report at the chosen quality and de-duplicates them."""
+
+    def __init__(self, quality="final"):
+        self.dpi = QUALITY_DPI[quality]
+        self._readers = {}
+        self.count = 0
+        self.png_bytes = 0
+
+    def render_png(self, fig, width=400, height=300):
+        import plotly.io as pio
+        scale = width / 72 * self.dpi / PLOT_LAYOUT_WIDTH
+        layout_height = round(PLOT_LAYOUT_WIDTH * height / width)
+        return pio.to_image(fig, format="png", width=PLOT_LAYOUT_WIDTH, height=layout_height, scale=scale)
+
+    def plot(self, fig, width=400, height=300):
+        png = self.render_png(fig, width, height)
+        digest = hashlib.sha1(png).digest()
+        self.count += 1
+        if digest not in self._readers:
+            self._readers[digest] = ImageReader(BytesIO(png))
+            self.png_bytes += len(png)
+        return SharedImage(self._readers[digest], width, height)
+
+    @property
+    def unique(self):
+        return len(self._readers)
+
+
+def build_pdf(elements, pagesize=A4, stats=None):
+    # stats, if given, is filled with the PDF size and per-page render times.
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=pagesize)
+    page_times = []
+    start = time.perf_counter()
+
+    def on_page(canvas, doc):
+        page_times.append(time.perf_counter())
+
+    doc.build(elements, onFirstPage=on_page, onLaterPages=on_page)
+    pdf_bytes = buffer.getvalue()
+    if stats is not None:
+        # onPage fires as each page begins, so a page lasts until the next one starts.
+        marks = page_times + [time.perf_counter()]
+        stats["pages"] = len(page_times)
+        stats["bytes"] = len(pdf_bytes)
+        stats["build_seconds"] = round(marks[-1] - start, 4)
+        stats["page_seconds"] = [round(b - a, 4) for a, b in zip(marks, marks[1:])]
+        stats["bytes_per_page"] = len(pdf_bytes) // max(len(page_times), 1)
+    return pdf_bytes
+
+
+def apartment_report_elements(apartment_scans, company_name, images=None):
+    styles = report_styles()
+    images = images or ReportImages()
+    body_style = styles["body"]
+
+    elements = []
+    elements.append(Paragraph("TREBIRTH TEST REPORT", styles["heading_centered"]))
+    elements.append(Spacer(1, 16))
+    elements.append(Paragraph("This Trebirth test report is a supplementary report only and is only a record of the test findings.", body_style))
+    elements.append(Spacer(1, 20))
+
+    if not apartment_scans:
+        elements.append(Paragraph("No data found.", body_style))
+        return elements
+
+    # RadarRaw as clean float arrays, once per scan (a no-op for scans validated at fetch time)
+    apartment_scans = validate_scans(apartment_scans, ("RadarRaw",))
+    first_scan = apartment_scans[0]
+    data = [
+        ["Tests were carried out by:", first_scan["CompanyName"]],
+        ["Date:", first_scan["scan_date"]],
+        ["Report for location at:", first_scan["City"]],
+        ["Name of the building/apartment:", first_scan["Apartment"]],
+    ]
+    table = Table(data, colWidths=[2.5 * inch, 3.5 * inch])
+    table.setStyle(
+        TableStyle([
+            ("ALIGN", (0, 0), (-1, -1), "LEFT"),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("TEXTCOLOR", (0, 0), (0, -1), colors.black),
+            ("TEXTCOLOR", (1, 0), (1, -1), colors.darkblue),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ])
+    )
+    elements.append(table)
+    elements.append(PageBreak())
+
+    area_scans = {}
+    for scan in apartment_scans:
+        area_scans.setdefault(scan.get("Room", "Unknown Area"), []).append(scan)
+
+    for i, (area, scans) in enumerate(area_scans.items(), start=1):
+        elements.append(Paragraph(f"{i} {area.upper()}", styles["heading_left"]))
+        for j, scan in enumerate(scans, start=1):
+            elements.append(Paragraph(f"{i}.{j} Radar Scan", styles["heading_sub"]))
+
+            radar_raw = scan.get("RadarRaw", [])
+            if len(radar_raw) == 0:
+                continue
+            processed_scan = preprocess_radar_data(radar_raw, validated=True)
+            device_name = scan.get("Devicename", "Unknown Device")
+            timestamp = scan.get("timestamp", datetime.now())
+            scan_duration = scan.get("ScanDuration", "Unknown")
+            fig = plot_time_domain(processed_scan, device_name, timestamp, scan_duration)
+            elements.append(images.plot(fig))
+
+            elements.append(Spacer(1, 12))
+            elements.append(Paragraph(f"Device Name: {device_name}", body_style))
+            elements.append(Spacer(1, 3))
+            try:
+                ts_obj = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+            except Exception:
+                ts_obj = timestamp
+            elements.append(Paragraph(f"Timestamp: {ts_obj}", body_style))
+            elements.append(Spacer(1, 3))
+            elements.append(Paragraph(f"Scan Duration: {scan_duration}", body_style))
+            elements.append(Spacer(1, 12))
+
+            data = [
+                ["Scan Location:", scan.get("Room", "N/A")],
+                ["Device was:", scan.get("Positioned", "N/A")],
+                ["Damage Visible:", scan.get("DamageVisible", "N/A")],
+            ]
+            table = Table(data, colWidths=[2.5 * inch, 3.5 * inch])
+            table.setStyle(
+                TableStyle([
+                    ("ALIGN", (0, 0), (0, -1), "LEFT"),
+                    ("ALIGN", (1, 0), (-1, -1), "LEFT"),
+                    ("BOTTOMPADDING", (0, 0), (-1, -1), 5),
+                ])
+            )
+            elements.append(table)
+            elements.append(Spacer(1, 20))
+    return elements
+
+
+def generate_pdf_for_apartment(apartment_scans, company_name, quality="final", stats=None):
+    # Returns the finished report as PDF bytes; nothing is written to disk.
+    start = time.perf_counter()
+    images = ReportImages(quality)
+    elements = apartment_report_elements(apartment_scans, company_name, images)
+    pdf_bytes = build_pdf(elements, stats=stats)
+    if stats is not None:
+        stats["quality"] = quality
+        stats["images"] = images.count
+        stats["unique_images"] = images.unique
+        stats["image_bytes"] = images.png_bytes
+        stats["seconds"] = round(time.perf_counter() - start, 4)
+    return pdf_bytes
@@ -0,0 +1,136 @@
+import itertools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from trebirth.firestore_client import get_client
+from trebirth.lazy import lazy_import
+from trebirth.queries import attach_radar
+
+# ReportLab, plotly and kaleido are only needed inside the worker processes.
+report_engine = lazy_import("trebirth.report_engine")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+def _worker_client(credentials_info):
+    # Each worker process opens its own Firestore client on first use.
+    return get_client(credentials_info) if credentials_info else None
+
+
+def render_apartment_report(credentials_info, apartment_scans, company_name, quality="final", stats=None):
+    # Runs in a worker process: load RadarRaw for the scans, then render the PDF.
+    db = _worker_client(credentials_info)
+    if db is not None:
+        attach_radar(db, apartment_scans)
+    return report_engine.generate_pdf_for_apartment(apartment_scans, company_name, quality=quality, stats=stats)
+
+
+class ReportJob:
+    def __init__(self, job_id, company_name, apartment, month, future, executor=None):
+        self.job_id = job_id
+        self.company_name = company_name
+        self.apartment = apartment
+        self.month = month
+        self.future = future
+        self.executor = executor
+        self.submitted = time.time()
+
+    @property
+    def status(self):
+        if self.future.done():
+            return FAILED if self.future.exception() is not None else DONE
+        return RUNNING if self.future.running() else QUEUED
+
+
+class ReportJobQueue:
+    """Renders apartment reports in a bounded pool of worker processes.
+
+    Pages submit a job and poll its status on later reruns, so a long report no
+    longer holds the Streamlit script thread. Finished PDFs stay in memory until
+    the page picks them up with pop() or the job ages out. If a worker dies
+    (a Chromium crash, the OOM killer) its jobs fail with BrokenProcessPool and
+    the pool is replaced, so later reports still render.
+    """
+
+    def __init__(self, max_workers=2, credentials_info=None, keep_seconds=3600):
+        self._max_workers = max_workers
+        self._executor = self._new_executor()
+        self._credentials_info = dict(credentials_info) if credentials_info else None
+        self._keep_seconds = keep_seconds
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, company_name, apartment_scans, month, apartment=None):
+        # Scans are sent without RadarRaw; the worker fetches it itself.
+        scans = [{k: v for k, v in scan.items() if k != "RadarRaw"} for scan in apartment_scans]
+        executor = self._executor
+        try:
+            future = executor.submit(render_apartment_report, self._credentials_info, scans, company_name)
+        except BrokenProcessPool:
+            executor = self._replace_broken(executor)
+            try:
+                future = executor.submit(render_apartment_report, self._credentials_info, scans, company_name)
+            except BrokenProcessPool as e:
+                # Reported through the job like any other failure.
+                future = Future()
+                future.set_exception(e)
+        with self._lock:
+            self._expire()
+            job_id = f"job{next(self._ids)}"
+            self._jobs[job_id] = ReportJob(job_id, company_name, apartment, month, future, executor)
+        return job_id
+
+    def status(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        status = job.status
+        if status == FAILED and isinstance(job.future.exception(), BrokenProcessPool):
+            self._replace_broken(job.executor)
+        return status
+
+    def result(self, job_id):
+        # PDF bytes of a finished job; raises the worker's exception if it failed.
+        return self._jobs[job_id].future.result(timeout=0)
+
+    def pop(self, job_id):
+        with self._lock:
+            return self._jobs.pop(job_id, None)
+
+    def take(self, job_id):
+        # result(), removing the job from the queue once it has been read.
+        try:
+            return self.result(job_id)
+        finally:
+            self.pop(job_id)
+
+    def pending(self):
+        return sum(job.status in (QUEUED, RUNNING) for job in list(self._jobs.values()))
+
+    def _expire(self):
+        cutoff = time.time() - self._keep_seconds
+        for job_id, job in list(self._jobs.items()):
+            if job.future.done() and job.submitted < cutoff:
+                del self._jobs[job_id]
+
+    def _new_executor(self):
+        # spawn rather than fork: the parent holds gRPC channels and threads.
+        return ProcessPoolExecutor(max_workers=self._max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _replace_broken(self, executor):
+        # A broken pool refuses every later submit; swap it out once, however
+        # many of its jobs notice, and return the pool to use now.
+        with self._lock:
+            if self._executor is executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+            return self._executor
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,130 @@
+import datetime
+import threading
+import time
+
+from trebirth.navigation import ScanIndex
+from trebirth.queries import company_scan_ids, fetch_scans, stream_company_scans
+
+# Seconds between full reconciles of a store against Firestore.
+RECONCILE_SECONDS = 15 * 60
+
+
+def _timestamp_kind(timestamp):
+    # Which high-water mark a scan timestamp moves; other types are left to reconciles.
+    if isinstance(timestamp, str):
+        return "str"
+    if isinstance(timestamp, datetime.datetime):
+        return "datetime"
+    return None
+
+
+class CompanyScans:
+    """Scan metadata and navigation index for one company, kept current by delta sync.
+
+    The store remembers the newest scan timestamp it has seen, one mark each for
+    string and datetime timestamps since Firestore orders the two types apart.
+    Each sync only asks Firestore for scans at or after those marks and merges
+    them into the index, so a refresh with nothing new reads just the boundary
+    document(s).
+
+    A scan uploaded late with an older timestamp, one edited without a newer
+    timestamp, or a deleted scan never shows up in that delta. So at most every
+    reconcile_seconds a sync lists the company's document ids and update times
+    with a keys-only query instead, fetches the metadata of scans the store is
+    missing or holds an older version of, and drops the ones that are gone.
+    """
+
+    def __init__(self, db, company_name, prepare=None, reconcile_seconds=RECONCILE_SECONDS):
+        self.db = db
+        self.company_name = company_name
+        self.prepare = prepare
+        self.reconcile_seconds = reconcile_seconds
+        self.index = ScanIndex()
+        self.high_water = {}
+        self.versions = {}
+        self.last_sync = None
+        self.last_reconcile = None
+        self._lock = threading.RLock()
+
+    def reconcile_due(self):
+        with self._lock:
+            return self.last_reconcile is None or time.time() - self.last_reconcile >= self.reconcile_seconds
+
+    def sync(self, full=None):
+        # Returns how many documents were new, changed or removed since the last
+        # sync. full=True forces a reconcile, full=False a delta; by default a
+        # reconcile runs when one is due.
+        if full is None:
+            full = self.reconcile_due()
+        with self._lock:
+            first = self.last_sync is None
+            marks = list(self.high_water.values())
+        versions = {}
+        if first:
+            # The first sync reads everything, which is a reconcile in itself.
+            fetched = list(stream_company_scans(self.db, self.company_name, versions=versions))
+            removed, full = [], True
+        elif full:
+            fetched, removed, versions = self._reconcile_changes()
+        else:
+            fetched, removed = [], []
+            for since in marks:
+                fetched += stream_company_scans(self.db, self.company_name, since=since, versions=versions)
+
+        # prepare gets the whole batch, so timestamp parsing runs once per sync.
+        if self.prepare:
+            self.prepare(fetched)
+
+        changed = 0
+        with self._lock:
+            for doc_id in removed:
+                self.versions.pop(doc_id, None)
+                if self.index.remove(doc_id) is not None:
+                    changed += 1
+            self.versions.update(versions)
+            for data in fetched:
+                timestamp = data.get("timestamp")
+                kind = _timestamp_kind(timestamp)
+                if kind and (kind not in self.high_water or timestamp > self.high_water[kind]):
+                    self.high_water[kind] = timestamp
+                if self.index.scans.get(data["doc_id"]) != data:
+                    self.index.add(data)
+                    changed += 1
+            self.last_sync = time.time()
+            if full:
+                self.last_reconcile = self.last_sync
+        return changed
+
+    def _reconcile_changes(self):
+        # (scans the store is missing or has an older version of, ids of scans
+        # that no longer exist, {doc_id: update_time} of the fetched scans)
+        remote = dict(company_scan_ids(self.db, self.company_name))
+        with self._lock:
+            local = set(self.index.scans)
+            stale = sorted(doc_id for doc_id, update_time in remote.items()
+                           if doc_id not in local or self.versions.get(doc_id) != update_time)
+        fetched = []
+        for doc_id, data in fetch_scans(self.db, stale).items():
+            data["doc_id"] = doc_id
+            fetched.append(data)
+        versions = {data["doc_id"]: remote[data["doc_id"]] for data in fetched}
+        return fetched, sorted(local - set(remote)), versions
+
+    # Readers go through the lock and get copies, since the store is shared by
+    # every session of the company while a refresh may be merging into it.
+
+    def cities(self):
+        with self._lock:
+            return list(self.index.cities())
+
+    def areas(self, city):
+        with self._lock:
+            return list(self.index.areas(city))
+
+    def months(self, city, area):
+        with self._lock:
+            return list(self.index.months(city, area))
+
+    def apartments(self, city, area, month):
+        with self._lock:
+            return self.index.apartments(city, area, month)
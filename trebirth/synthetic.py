@@ -0,0 +1,189 @@
+import datetime
+
+import numpy as np
+
+ROOMS = ["Hall", "Kitchen", "Bedroom 1", "Bedroom 2", "Bathroom", "Balcony", "Store Room", "Pooja Room"]
+POSITIONS = ["On Wall", "On Floor", "On Furniture", "On Door Frame"]
+SAMPLING_RATE = 100
+
+
+def radar_signal(rng, samples, infested=False, sampling_rate=SAMPLING_RATE):
+    # Offset + slow drift + mains hum + sensor noise, plus short bursts of
+    # activity when the wood is infested.
+    t = np.arange(samples) / sampling_rate
+    signal = (
+        rng.uniform(1500, 2500)
+        + rng.uniform(-5, 5) * t
+        + rng.uniform(5, 20) * np.sin(2 * np.pi * rng.uniform(0.1, 0.5) * t)
+        + rng.normal(0, rng.uniform(3, 8), samples)
+    )
+    if infested:
+        for _ in range(rng.integers(2, 8)):
+            start = rng.integers(0, max(samples - 50, 1))
+            length = rng.integers(10, 50)
+            burst = rng.uniform(40, 120) * np.sin(2 * np.pi * rng.uniform(8, 25) * t[:length])
+            signal[start:start + length] += burst[:samples - start]
+    return signal
+
+
+def accelerometer_signal(rng, samples, infested=False, sampling_rate=SAMPLING_RATE):
+    # Gravity component on one axis + small handling tremor + noise; borer
+    # activity shows up as faint high-frequency bursts.
+    t = np.arange(samples) / sampling_rate
+    signal = (
+        rng.choice([-1, 0, 1]) * rng.uniform(0.9, 1.1)
+        + rng.uniform(0.005, 0.02) * np.sin(2 * np.pi * rng.uniform(1, 4) * t)
+        + rng.normal(0, rng.uniform(0.002, 0.006), samples)
+    )
+    if infested:
+        for _ in range(rng.integers(2, 8)):
+            start = rng.integers(0, max(samples - 50, 1))
+            length = rng.integers(10, 50)
+            burst = rng.uniform(0.02, 0.06) * np.sin(2 * np.pi * rng.uniform(15, 40) * t[:length])
+            signal[start:start + length] += burst[:samples - start]
+    return signal
+
+
+def _samples(values, as_list):
+    values = np.round(values, 3)
+    return values.tolist() if as_list else values
+
+
+def pestcontrol_scan(rng, doc_id, company="PCI", city="Pune", area="Baner", apartment="Apartment 1",
+                     room="Hall", timestamp="2025-01-01 10:00:00", samples=3000, infested=None,
+                     infection_ratio=0.3, as_list=True):
+    # One document shaped like the pestcontrolindia collection.
+    if infested is None:
+        infested = rng.random() < infection_ratio
+    return {
+        "doc_id": doc_id,
+        "CompanyName": company,
+        "City": city,
+        "Area": area,
+        "Apartment": apartment,
+        "Room": room,
+        "Incharge": "Synthetic Incharge",
+        "Devicename": f"Trebirth ({rng.integers(1, 9)})",
+        "ScanDuration": f"{samples / SAMPLING_RATE:.0f} seconds",
+        "Positioned": POSITIONS[rng.integers(len(POSITIONS))],
+        "DamageVisible": "Yes" if infested else "No",
+        "timestamp": timestamp,
+        "scan_date": timestamp[:10],
+        "RadarRaw": _samples(radar_signal(rng, samples, infested), as_list),
+    }
+
+
+def bt_classic_scan(rng, row, tree, scan, infested, timestamp, bucket=1, samples=3000,
+                    sampling_rate=SAMPLING_RATE, as_list=True):
+    # One document shaped like BT_Classic: radar plus three accelerometer axes.
+    data = {
+        "RowNo": row,
+        "TreeNo": tree,
+        "ScanNo": scan,
+        "BucketID": bucket,
+        "TreeID": f"R{row}T{tree}",
+        "InfStat": "Infected" if infested else "Healthy",
+        "Devicename": f"Trebirth ({rng.integers(1, 9)})",
+        "SamplingRate": sampling_rate,
+        "timestamp": timestamp,
+        "RadarRaw": _samples(radar_signal(rng, samples, infested, sampling_rate), as_list),
+    }
+    for axis in ("Ax", "Ay", "Az"):
+        data[axis] = _samples(accelerometer_signal(rng, samples, infested, sampling_rate), as_list)
+    return data
+
+
+def demo_day_scan(rng, infested, timestamp, samples=3000, as_list=True):
+    # One document shaped like demo_day, which the farm dashboard reads.
+    return {
+        "InfStat": "Infected" if infested else "Healthy",
+        "Devicename": f"Trebirth ({rng.integers(1, 4)})",
+        "timestamp": timestamp,
+        "RadarRaw": _samples(radar_signal(rng, samples, infested), as_list),
+    }
+
+
+def synthetic_apartment(scan_count, samples=3000, seed=0, company="PCI", apartment="Apartment 1"):
+    # scan_count scans of one apartment spread over its rooms, as one report sees them.
+    rng = np.random.default_rng(seed)
+    scans = []
+    for i in range(scan_count):
+        minute = i % 60
+        scans.append(pestcontrol_scan(
+            rng, f"synthetic{i}", company=company, apartment=apartment,
+            room=ROOMS[i % len(ROOMS)], timestamp=f"2025-01-15 10:{minute:02d}:00", samples=samples,
+        ))
+    return scans
+
+
+# Sizes for synthetic_database(); "large" is a few million samples per collection.
+PRESETS = {
+    "small": dict(rows=2, trees_per_row=5, scans_per_tree=2, demo_day_scans=20, scans_per_apartment=8,
+                  apartments_per_area=2, months=2, samples=3000),
+    "large": dict(rows=10, trees_per_row=20, scans_per_tree=3, demo_day_scans=500, scans_per_apartment=24,
+                  apartments_per_area=4, months=6, samples=3000),
+}
+
+CUSTOMERS = {
+    "PCI": {"Pune": ["Baner", "Kothrud"], "Mumbai": ["Andheri"]},
+    "Trebirth": {"Pune": ["Aundh"], "Bengaluru": ["Indiranagar", "Whitefield"]},
+}
+
+
+def synthetic_database(preset="small", seed=0, infection_ratio=0.3, sampling_rates=(SAMPLING_RATE,), **sizes):
+    """Synthetic BT_Classic, demo_day and pestcontrolindia collections.
+
+    Returns {collection: {doc_id: data}} for FakeClient. Signals are kept as
+    NumPy arrays (the fake turns them into lists on read), so millions of
+    samples stay compact. The same preset and seed always give the same data.
+    """
+    sizes = dict(PRESETS[preset], **sizes)
+    rng = np.random.default_rng(seed)
+    samples = sizes["samples"]
+    start = datetime.datetime(2025, 1, 1, 4, 30, tzinfo=datetime.timezone.utc)
+
+    bt_classic = {}
+    for row in range(1, sizes["rows"] + 1):
+        for tree in range(1, sizes["trees_per_row"] + 1):
+            # A tree is infested or not; all its scans share the label.
+            infested = rng.random() < infection_ratio
+            for scan in range(1, sizes["scans_per_tree"] + 1):
+                timestamp = start + datetime.timedelta(days=row, minutes=10 * tree + scan)
+                sampling_rate = sampling_rates[(tree + scan) % len(sampling_rates)]
+                length = samples * sampling_rate // SAMPLING_RATE
+                bt_classic[f"T{tree}R{row}S{scan}"] = bt_classic_scan(
+                    rng, row, tree, scan, infested, timestamp, samples=length,
+                    sampling_rate=sampling_rate, as_list=False,
+                )
+
+    demo_day = {}
+    for i in range(sizes["demo_day_scans"]):
+        timestamp = start + datetime.timedelta(hours=i)
+        demo_day[f"demo{i}"] = demo_day_scan(rng, rng.random() < infection_ratio, timestamp, samples, as_list=False)
+
+    pestcontrolindia = {}
+    count = 0
+    for company, cities in CUSTOMERS.items():
+        for city, areas in cities.items():
+            for area in areas:
+                for apartment in range(1, sizes["apartments_per_area"] + 1):
+                    for month in range(1, sizes["months"] + 1):
+                        for i in range(sizes["scans_per_apartment"]):
+                            doc_id = f"synthetic{count}"
+                            timestamp = f"2025-{month:02d}-{1 + apartment:02d} 10:{i % 60:02d}:00"
+                            pestcontrolindia[doc_id] = pestcontrol_scan(
+                                rng, doc_id, company=company, city=city, area=area,
+                                apartment=f"Apartment {apartment}", room=ROOMS[i % len(ROOMS)],
+                                timestamp=timestamp, samples=samples, infection_ratio=infection_ratio,
+                                as_list=False,
+                            )
+                            # doc_id and scan_date are added by the app, not stored.
+                            del pestcontrolindia[doc_id]["doc_id"], pestcontrolindia[doc_id]["scan_date"]
+                            count += 1
+
+    return {"BT_Classic": bt_classic, "demo_day": demo_day, "pestcontrolindia": pestcontrolindia}
+
+
+def fake_client(preset="small", seed=0, **kwargs):
+    from trebirth.fake_firestore import FakeClient
+    return FakeClient(synthetic_database(preset, seed, **kwargs))
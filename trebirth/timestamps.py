@@ -0,0 +1,119 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from dateutil import parser
+
+LOCAL_TZ = "Asia/Kolkata"
+
+# Tried in order when a new string layout is seen; the winner is cached per layout.
+# Only year-first layouts are listed: "01/02/2025" could be either day order, so
+# layouts like it fall through to dateutil, which reads them month first.
+CANDIDATE_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y-%m-%dT%H:%M:%S.%f%z",
+    "%Y-%m-%d %H:%M:%S%z",
+    "%Y-%m-%d %H:%M:%S.%f%z",
+    "%Y-%m-%d",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y/%m/%d",
+]
+
+_DIGITS = str.maketrans("0123456789", "0000000000")
+_format_cache = {}
+
+
+def guess_format(text):
+    # Strings with the same layout (digits masked out) share one strptime format,
+    # so a batch of thousands of timestamps costs one guess.
+    layout = text.translate(_DIGITS)
+    if layout not in _format_cache:
+        _format_cache[layout] = None
+        for fmt in CANDIDATE_FORMATS:
+            try:
+                datetime.strptime(text, fmt)
+            except ValueError:
+                continue
+            _format_cache[layout] = fmt
+            break
+    return _format_cache[layout]
+
+
+def _to_utc_ns(parsed, tz):
+    # Naive values are wall-clock times in tz; aware values are converted.
+    index = pd.DatetimeIndex(parsed)
+    if index.tz is None:
+        index = index.tz_localize(tz, ambiguous="NaT", nonexistent="NaT")
+    return index.tz_convert("UTC").as_unit("ns").asi8
+
+
+def _parse_one(value, tz):
+    try:
+        parsed = parser.parse(str(value))
+    except (ValueError, OverflowError):
+        return np.iinfo(np.int64).min
+    return _to_utc_ns([pd.Timestamp(parsed)], tz)[0]
+
+
+def normalize_timestamps(values, tz=LOCAL_TZ):
+    """Convert a batch of timestamps in one pass.
+
+    Accepts Firestore DatetimeWithNanoseconds / datetime objects and strings in
+    any mix. Values without a UTC offset, naive datetimes and strings alike,
+    are taken as wall-clock times in tz. Returns a DataFrame with ``epoch_ns`` (int64 UTC nanoseconds,
+    int64 min for missing values), ``local`` (tz-aware datetimes in tz) and
+    ``local_date`` (datetime.date or None).
+    """
+    values = list(values)
+    epoch_ns = np.full(len(values), np.iinfo(np.int64).min, dtype=np.int64)
+
+    datetime_idx = [i for i, value in enumerate(values) if isinstance(value, datetime)]
+    aware_idx = [i for i in datetime_idx if values[i].tzinfo is not None]
+    naive_idx = [i for i in datetime_idx if values[i].tzinfo is None]
+    if aware_idx:
+        # Fast path: Firestore returns tz-aware datetimes, pandas converts them at once.
+        epoch_ns[aware_idx] = pd.to_datetime([values[i] for i in aware_idx], utc=True).as_unit("ns").asi8
+    if naive_idx:
+        # Naive datetimes are wall-clock times in tz, the same as naive strings.
+        epoch_ns[naive_idx] = _to_utc_ns(pd.to_datetime([values[i] for i in naive_idx]), tz)
+
+    by_format = {}
+    for i, value in enumerate(values):
+        if isinstance(value, str) and value.strip():
+            by_format.setdefault(guess_format(value.strip()), []).append(i)
+    for fmt, idx in by_format.items():
+        texts = [values[i].strip() for i in idx]
+        if fmt is None:
+            epoch_ns[idx] = [_parse_one(text, tz) for text in texts]
+        elif "%z" in fmt:
+            epoch_ns[idx] = pd.to_datetime(texts, format=fmt, errors="coerce", utc=True).as_unit("ns").asi8
+        else:
+            epoch_ns[idx] = _to_utc_ns(pd.to_datetime(texts, format=fmt, errors="coerce"), tz)
+
+    local = pd.Series(pd.to_datetime(epoch_ns, unit="ns", utc=True).tz_convert(tz))
+    local_date = local.dt.date.where(local.notna(), None)
+    return pd.DataFrame({"epoch_ns": epoch_ns, "local": local, "local_date": local_date})
+
+
+def add_local_dates(records, field="timestamp", out_field="scan_date", tz=LOCAL_TZ,
+                    date_format="%Y-%m-%d", missing="Unknown Date"):
+    # Writes the local date of records[i][field] into records[i][out_field] for
+    # the whole batch; date_format=None stores datetime.date objects instead.
+    records = list(records)
+    if not records:
+        return records
+    local_date = normalize_timestamps([record.get(field) for record in records], tz)["local_date"]
+    # A batch spans few distinct days, so format each day once; code -1 (missing)
+    # picks the trailing missing label.
+    codes, days = pd.factorize(local_date)
+    if date_format is None:
+        labels = list(days) + [missing]
+    else:
+        labels = [day.strftime(date_format) for day in days] + [missing]
+    for record, code in zip(records, codes):
+        record[out_field] = labels[code]
+    return records
@@ -0,0 +1,94 @@
+"""Validation of scan arrays, done once when Firestore documents are decoded.
+
+Firestore hands back RadarRaw/Ax/Ay/Az as Python lists that can hold None,
+NaN, numbers stored as text or the odd non-numeric value. validate_scans turns
+every such field into a clean float64 array with the bad samples dropped,
+converting all scans of a field in one NumPy pass, and records what it dropped:
+
+    NaNCount      samples that were missing (None/NaN)
+    InvalidCount  samples that were present but not finite numbers
+    Validated     True once the document has been through here
+
+Code that receives validated documents can pass validated=True to the
+preprocessing helpers and skip their own to_numeric/dropna/fillna steps.
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+
+SCAN_FIELDS = ("RadarRaw", "Ax", "Ay", "Az")
+
+
+def _flatten(scans):
+    return list(itertools.chain.from_iterable(scans))
+
+
+def _to_float(scans, total):
+    # Fast path: every sample a number, read straight into one float64 buffer.
+    try:
+        return np.fromiter(itertools.chain.from_iterable(scans), dtype=float, count=total)
+    except (TypeError, ValueError):
+        pass
+    values = _flatten(scans)
+    series = pd.Series(values, dtype=object)
+    try:
+        return pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+    except TypeError:
+        # Lists or dicts among the samples: anything that is not a number is invalid.
+        return np.array([np.nan if isinstance(value, (list, tuple, dict, np.ndarray)) else pd.to_numeric(value, errors="coerce")
+                         for value in values], dtype=float)
+
+
+def _missing(scans, array):
+    # NaN in the result is missing if the source sample was None/NaN, invalid otherwise.
+    if len(array) and np.isnan(array).any():
+        return pd.isna(pd.Series(_flatten(scans), dtype=object)).to_numpy()
+    return np.zeros(len(array), dtype=bool)
+
+
+def _segment_sums(mask, offsets):
+    counts = np.concatenate([[0], np.cumsum(mask)])
+    return counts[offsets[1:]] - counts[offsets[:-1]]
+
+
+def _scan_values(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return value
+    return [value]
+
+
+def validate_scans(docs, fields=SCAN_FIELDS):
+    """Return copies of docs with every scan field as a clean float array.
+
+    Documents already marked Validated are passed through unchanged. A field
+    set to None becomes an empty array; a field that is absent stays absent.
+    """
+    docs = [dict(doc) for doc in docs]
+    pending = [doc for doc in docs if not doc.get("Validated")]
+    for doc in pending:
+        doc["NaNCount"] = 0
+        doc["InvalidCount"] = 0
+    for field in fields:
+        members = [doc for doc in pending if field in doc]
+        if not members:
+            continue
+        raw = [_scan_values(doc[field]) for doc in members]
+        offsets = np.concatenate([[0], np.cumsum([len(scan) for scan in raw])]).astype(int)
+        values = _to_float(raw, offsets[-1])
+        finite = np.isfinite(values)
+        missing = _missing(raw, values)
+        nan_counts = _segment_sums(missing, offsets)
+        invalid_counts = _segment_sums(~finite & ~missing, offsets)
+        # One buffer of the finite samples, cut back into one array per scan.
+        kept = _segment_sums(finite, offsets)
+        scans = np.split(values[finite], np.cumsum(kept)[:-1])
+        for doc, scan, nan_count, invalid_count in zip(members, scans, nan_counts, invalid_counts):
+            doc[field] = scan
+            doc["NaNCount"] += int(nan_count)
+            doc["InvalidCount"] += int(invalid_count)
+    for doc in pending:
+        doc["Validated"] = True
+    return docs